@@ -1,4 +1,8 @@
-from typing import Literal, Tuple, Dict, Optional, List
+from typing import Callable, FrozenSet, Literal, Tuple, Dict, Optional, List, Union
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
 import os
 import time
 import json
@@ -6,8 +10,15 @@ import PyPDF2
 import re 
 import uuid 
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 import hashlib
+import shutil
+import stat
+import tempfile
+import threading
+import asyncio
+import random
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 # KRITIS: Streamlit harus diimpor di global scope
@@ -16,17 +27,28 @@ from phi.agent import Agent
 from phi.model.google import Gemini
 from phi.utils.log import logger
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
 # Import Supabase
 try:
+    import httpx
     from supabase import create_client, Client
+    try:
+        from supabase import ClientOptions
+    except ImportError:
+        from supabase.lib.client_options import ClientOptions
     SUPABASE_AVAILABLE = True
 except ImportError:
+    Client = None
     SUPABASE_AVAILABLE = False
     logger.warning("Supabase library not found. Install: pip install supabase")
 
 # Impor library tambahan untuk OCR
 try:
-    from pdf2image import convert_from_bytes
+    from pdf2image import convert_from_path, pdfinfo_from_bytes
     import pytesseract
     from PIL import Image
     OCR_AVAILABLE = True
@@ -34,13 +56,39 @@ except ImportError:
     OCR_AVAILABLE = False
     logger.warning("OCR libraries not found. Install: pip install pdf2image pytesseract pillow")
 
+# Impor backend ekstraksi teks PDF yang lebih cepat (opsional, PyPDF2 sebagai cadangan)
+try:
+    import pypdfium2 as pdfium
+    PYPDFIUM2_AVAILABLE = True
+except ImportError:
+    PYPDFIUM2_AVAILABLE = False
+
+# SDK Gemini untuk client per agent (opsional; tanpa ini phi membuat client sendiri per run)
+try:
+    import google.generativeai as genai
+    GENAI_CLIENT_AVAILABLE = True
+except ImportError:
+    GENAI_CLIENT_AVAILABLE = False
+
+try:
+    from io import StringIO
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    PDFMINER_AVAILABLE = True
+except ImportError:
+    PDFMINER_AVAILABLE = False
+
 # Impor Pandas untuk menampilkan data dalam bentuk tabel
 try:
     import pandas as pd
     from io import BytesIO 
     import openpyxl
     import requests
-    from urllib.parse import urlparse
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
     PANDAS_AVAILABLE = True
 except ImportError:
     pd = None
@@ -51,8 +99,31 @@ except ImportError:
 
 
 # --- SUPABASE CONFIGURATION ---
+SUPABASE_HEALTH_TTL = 60  # detik; status koneksi di sidebar tidak dicek ulang setiap rerun
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _create_supabase_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Create the process-wide Supabase client for a (url, key) pair.
+    The underlying httpx client keeps connections alive, so every load_*/save_*
+    call reuses the same pooled TLS sessions instead of reconnecting.
+    """
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+    )
+    try:
+        options = ClientOptions(httpx_client=http_client)
+    except TypeError:
+        # supabase-py lama belum mendukung httpx_client; gunakan pool bawaan
+        http_client.close()
+        options = ClientOptions()
+    return create_client(supabase_url, supabase_key, options=options)
+
+
 def get_supabase_client() -> Optional[Client]:
-    """Initialize Supabase client"""
+    """Return the shared Supabase client for the credentials in session state"""
     if not SUPABASE_AVAILABLE:
         return None
     
@@ -63,12 +134,38 @@ def get_supabase_client() -> Optional[Client]:
         return None
     
     try:
-        return create_client(supabase_url, supabase_key)
+        return _create_supabase_client(supabase_url, supabase_key)
     except Exception as e:
         logger.error(f"Failed to create Supabase client: {e}")
         return None
 
 
+@st.cache_data(ttl=SUPABASE_HEALTH_TTL, show_spinner=False)
+def _check_supabase_connection(supabase_url: str, supabase_key: str) -> bool:
+    """Run a minimal query to verify the connection; cached for SUPABASE_HEALTH_TTL seconds."""
+    try:
+        client = _create_supabase_client(supabase_url, supabase_key)
+        client.table('recruitment_roles').select('role_id').limit(1).execute()
+        return True
+    except Exception as e:
+        logger.error(f"Supabase health check failed: {e}")
+        return False
+
+
+def is_supabase_connected() -> bool:
+    """Cached connection health for the credentials in session state."""
+    if not SUPABASE_AVAILABLE:
+        return False
+    
+    supabase_url = st.session_state.get('supabase_url', '')
+    supabase_key = st.session_state.get('supabase_key', '')
+    
+    if not supabase_url or not supabase_key:
+        return False
+    
+    return _check_supabase_connection(supabase_url, supabase_key)
+
+
 # --- 1. DICTIONARY UNTUK TEKS DWIBASA (BAHASA INDONESIA & INGGRIS) ---
 TEXTS = {
     # Sidebar & Konfigurasi - TEMA NATURE
@@ -77,11 +174,24 @@ TEXTS = {
     'gemini_settings': {'id': "Pengaturan Google Gemini", 'en': "Google Gemini Settings"},
     'api_key_label': {'id': "Kunci API Google", 'en': "Google API Key"},
     'api_key_help': {'id': "Dapatkan kunci API Anda dari aistudio.google.com", 'en': "Get your API key from aistudio.google.com"},
+    'batch_prompting': {'id': "Analisa beberapa CV pendek dalam satu permintaan AI", 'en': "Analyze several short CVs in one AI request"},
+    'batch_prompting_help': {'id': "Menghemat jumlah permintaan dan token; CV yang hasilnya tidak valid dianalisa ulang satu per satu", 'en': "Saves requests and tokens; CVs with an invalid result are re-analyzed one by one"},
+    'triage_mode': {'id': "Mode triase: putuskan CV yang jelas tanpa AI", 'en': "Triage mode: decide clear-cut CVs without AI"},
+    'triage_mode_help': {'id': "CV dengan skor baseline jauh di atas atau di bawah batas 70% diputuskan langsung dengan ringkasan otomatis; hanya CV di sekitar batas yang dianalisa AI", 'en': "CVs whose baseline score is far above or below the 70% pass mark are decided directly with a templated summary; only borderline CVs are analyzed by the AI"},
+    'triage_margin': {'id': "Rentang peninjauan AI (± poin dari 70%)", 'en': "AI review band (± points around 70%)"},
+    'triage_margin_help': {'id': "CV dengan skor baseline dalam rentang ini tetap dianalisa AI", 'en': "CVs with a baseline score inside this band are still analyzed by the AI"},
+    'force_reanalyze': {'id': "Analisa ulang CV yang sudah pernah dianalisa", 'en': "Re-analyze previously analyzed CVs"},
+    'force_reanalyze_help': {'id': "Abaikan cache hasil analisa dan panggil AI lagi untuk setiap CV", 'en': "Ignore cached analysis results and call the AI again for every CV"},
     'warning_missing_config': {'id': "⚠️ Harap konfigurasikan hal berikut di sidebar: ", 'en': "⚠️ Please configure the following in the sidebar: "},
     'language_select': {'id': "Pilih Bahasa", 'en': "Select Language"},
     'reset_button': {'id': "🔄 Reset Aplikasi", 'en': "🔄 Reset Application"},
     'ocr_settings': {'id': "Pengaturan OCR", 'en': "OCR Settings"},
     'enable_ocr': {'id': "Aktifkan OCR untuk PDF Gambar", 'en': "Enable OCR for Image PDFs"},
+    'ocr_profile': {'id': "Profil OCR", 'en': "OCR Profile"},
+    'ocr_profile_help': {'id': "Cepat: DPI rendah untuk batch besar. Akurat: DPI tinggi dan binarisasi untuk scan berkualitas buruk.", 'en': "Fast: low DPI for large batches. Accurate: high DPI and binarization for poor-quality scans."},
+    'ocr_profile_fast': {'id': "Cepat", 'en': "Fast"},
+    'ocr_profile_balanced': {'id': "Seimbang", 'en': "Balanced"},
+    'ocr_profile_accurate': {'id': "Akurat", 'en': "Accurate"},
     'ocr_help': {'id': "OCR akan memindai PDF berbasis gambar untuk ekstraksi teks yang lebih baik", 'en': "OCR will scan image-based PDFs for better text extraction"},
     
     # Supabase Settings
@@ -194,17 +304,159 @@ def get_text(key: str) -> str:
 
 # --- 2. SUPABASE DATABASE FUNCTIONS ---
 
+# Shared write layer: setiap tabel menyimpan snapshot {key: fingerprint} dari
+# baris yang terakhir dipersist, sehingga save hanya mengirim perubahan.
+def _row_fingerprint(row: Dict) -> str:
+    """Content hash of a row, used to skip rows that have not changed."""
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _remember_table_snapshot(table: str, rows: Dict[str, Dict]):
+    """Record rows as the last persisted state of a table."""
+    snapshots = st.session_state.setdefault('persisted_snapshots', {})
+    snapshots[table] = {key: _row_fingerprint(row) for key, row in rows.items()}
+
+
+def _forget_table_snapshot(table: str, empty: bool = True):
+    """Mark a table as empty (after a wipe) or as unknown (forces a key-only reload)."""
+    snapshots = st.session_state.setdefault('persisted_snapshots', {})
+    if empty:
+        snapshots[table] = [] if table == 'chat_history' else {}
+    else:
+        snapshots.pop(table, None)
+
+
+def _get_table_snapshot(supabase, table: str, key_column: str) -> Dict[str, Optional[str]]:
+    """
+    Return {key: fingerprint} of the rows currently stored in a table.
+    Falls back to a single key-only query when this session has no snapshot yet.
+    """
+    snapshots = st.session_state.setdefault('persisted_snapshots', {})
+    if table not in snapshots:
+        response = supabase.table(table).select(key_column).execute()
+        snapshots[table] = {item[key_column]: None for item in response.data}
+    return snapshots[table]
+
+
+def _upsert_rows(supabase, table: str, key_column: str, rows: List[Dict], snapshot: Dict[str, Optional[str]]):
+    """
+    Bulk upsert rows on key_column. PostgREST needs a UNIQUE constraint on that
+    column (see README, "Skema Supabase"); without it (error 42P10) new rows are
+    inserted in bulk and changed rows are updated one by one.
+    """
+    try:
+        supabase.table(table).upsert(rows, on_conflict=key_column).execute()
+        return
+    except Exception as e:
+        if getattr(e, 'code', None) != '42P10' and '42P10' not in str(e):
+            raise
+        logger.error(f"Table {table} has no UNIQUE constraint on {key_column}; "
+                     f"falling back to insert/update. Add the constraint from the README.")
+    
+    new_rows = [row for row in rows if row[key_column] not in snapshot]
+    if new_rows:
+        supabase.table(table).insert(new_rows).execute()
+    for row in rows:
+        if row[key_column] in snapshot:
+            supabase.table(table).update(row).eq(key_column, row[key_column]).execute()
+
+
+def sync_table_rows(supabase, table: str, key_column: str, rows: Dict[str, Dict],
+                    timestamp_column: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Persist the difference between rows and the last persisted snapshot of a table.
+    New/changed rows go out as one bulk upsert, removed keys as one delete.
+    Returns (written, deleted).
+    """
+    snapshot = _get_table_snapshot(supabase, table, key_column)
+    
+    changed_rows = []
+    stamp = datetime.now().isoformat()
+    for key, row in rows.items():
+        if snapshot.get(key) != _row_fingerprint(row):
+            changed_row = dict(row)
+            if timestamp_column:
+                changed_row[timestamp_column] = stamp
+            changed_rows.append(changed_row)
+    
+    removed_keys = [key for key in snapshot if key not in rows]
+    
+    if changed_rows:
+        _upsert_rows(supabase, table, key_column, changed_rows, snapshot)
+    if removed_keys:
+        supabase.table(table).delete().in_(key_column, removed_keys).execute()
+    
+    _remember_table_snapshot(table, rows)
+    return len(changed_rows), len(removed_keys)
+
+
+def _role_rows(roles: Dict[str, str]) -> Dict[str, Dict]:
+    """Build recruitment_roles rows keyed by role_id."""
+    return {
+        role_id: {'role_id': role_id, 'requirements': requirements}
+        for role_id, requirements in roles.items()
+    }
+
+
+# Cache roles per proses: tabel kecil ini dibaca berkali-kali per rerun dan per CV.
+# Setiap perubahan lewat save_roles menaikkan versi cache.
+ROLES_CACHE_TTL = 300  # detik; batas basi untuk perubahan dari proses lain
+_ROLES_CACHE: Dict[str, Dict] = {}
+_ROLES_CACHE_LOCK = threading.Lock()
+
+
+def _roles_cache_key() -> str:
+    """Roles are cached per Supabase project."""
+    return st.session_state.get('supabase_url', '')
+
+
+def _store_roles_cache(roles: Dict[str, str]) -> int:
+    """Put roles in the cache under a new version and return that version."""
+    with _ROLES_CACHE_LOCK:
+        entry = _ROLES_CACHE.get(_roles_cache_key(), {})
+        version = entry.get('version', 0) + 1
+        _ROLES_CACHE[_roles_cache_key()] = {
+            'version': version,
+            'roles': dict(roles),
+            'loaded_at': time.monotonic()
+        }
+        return version
+
+
+def invalidate_roles_cache():
+    """Drop cached roles so the next load_roles() reads from Supabase."""
+    with _ROLES_CACHE_LOCK:
+        entry = _ROLES_CACHE.get(_roles_cache_key())
+        if entry:
+            entry['loaded_at'] = None
+
+
+def roles_cache_version() -> int:
+    """Current version of the cached roles (0 if nothing is cached)."""
+    with _ROLES_CACHE_LOCK:
+        return _ROLES_CACHE.get(_roles_cache_key(), {}).get('version', 0)
+
+
 def load_roles() -> Dict[str, str]:
-    """Load roles from Supabase"""
+    """Load roles from the in-process cache, reading Supabase only on a miss"""
+    with _ROLES_CACHE_LOCK:
+        entry = _ROLES_CACHE.get(_roles_cache_key())
+        if entry and entry['loaded_at'] is not None and time.monotonic() - entry['loaded_at'] < ROLES_CACHE_TTL:
+            # Salinan, karena pemanggil boleh mengubah dict lalu menyimpannya
+            return dict(entry['roles'])
+    
     supabase = get_supabase_client()
     if not supabase:
         return {}
     
     try:
-        response = supabase.table('recruitment_roles').select('*').execute()
+        response = supabase.table('recruitment_roles').select('role_id, requirements').execute()
         roles = {}
         for item in response.data:
             roles[item['role_id']] = item['requirements']
+        _remember_table_snapshot('recruitment_roles', _role_rows(roles))
+        _store_roles_cache(roles)
+        warm_role_profiles(roles)
         return roles
     except Exception as e:
         logger.error(f"Error loading roles from Supabase: {e}")
@@ -212,29 +464,36 @@ def load_roles() -> Dict[str, str]:
 
 
 def save_roles(roles: Dict[str, str]) -> bool:
-    """Save roles to Supabase"""
+    """Save roles to Supabase (only added, edited and deleted roles are written)"""
     supabase = get_supabase_client()
     if not supabase:
         return False
     
     try:
-        # Delete all existing roles first
-        supabase.table('recruitment_roles').delete().neq('role_id', '').execute()
-        
-        # Insert new roles
-        for role_id, requirements in roles.items():
-            supabase.table('recruitment_roles').upsert({
-                'role_id': role_id,
-                'requirements': requirements,
-                'updated_at': datetime.now().isoformat()
-            }, on_conflict='role_id').execute()
-        
+        sync_table_rows(supabase, 'recruitment_roles', 'role_id', _role_rows(roles), timestamp_column='updated_at')
+        _store_roles_cache(roles)
+        warm_role_profiles(roles)
         return True
     except Exception as e:
         logger.error(f"Error saving roles to Supabase: {e}")
+        _forget_table_snapshot('recruitment_roles', empty=False)
+        invalidate_roles_cache()
         return False
 
 
+def _memory_rows(memory: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Build analysis_memory rows keyed by candidate_id."""
+    return {
+        candidate_id: {
+            'candidate_id': candidate_id,
+            'analysis': data['analysis'],
+            'role': data['role'],
+            'timestamp': data['timestamp']
+        }
+        for candidate_id, data in memory.items()
+    }
+
+
 def load_analysis_memory() -> Dict[str, Dict]:
     """Load analysis memory from Supabase"""
     supabase = get_supabase_client()
@@ -242,7 +501,7 @@ def load_analysis_memory() -> Dict[str, Dict]:
         return {}
     
     try:
-        response = supabase.table('analysis_memory').select('*').execute()
+        response = supabase.table('analysis_memory').select('candidate_id, analysis, role, timestamp').execute()
         memory = {}
         for item in response.data:
             memory[item['candidate_id']] = {
@@ -250,6 +509,7 @@ def load_analysis_memory() -> Dict[str, Dict]:
                 'role': item['role'],
                 'timestamp': item['timestamp']
             }
+        _remember_table_snapshot('analysis_memory', _memory_rows(memory))
         return memory
     except Exception as e:
         logger.error(f"Error loading analysis memory from Supabase: {e}")
@@ -257,27 +517,17 @@ def load_analysis_memory() -> Dict[str, Dict]:
 
 
 def save_analysis_memory(memory: Dict[str, Dict]) -> bool:
-    """Save analysis memory to Supabase"""
+    """Save analysis memory to Supabase (only new, changed and trimmed entries are written)"""
     supabase = get_supabase_client()
     if not supabase:
         return False
     
     try:
-        # Delete all existing memory first
-        supabase.table('analysis_memory').delete().neq('candidate_id', '').execute()
-        
-        # Insert new memory
-        for candidate_id, data in memory.items():
-            supabase.table('analysis_memory').upsert({
-                'candidate_id': candidate_id,
-                'analysis': data['analysis'],
-                'role': data['role'],
-                'timestamp': data['timestamp']
-            }, on_conflict='candidate_id').execute()
-        
+        sync_table_rows(supabase, 'analysis_memory', 'candidate_id', _memory_rows(memory))
         return True
     except Exception as e:
         logger.error(f"Error saving analysis memory to Supabase: {e}")
+        _forget_table_snapshot('analysis_memory', empty=False)
         return False
 
 
@@ -288,7 +538,11 @@ def load_chat_history() -> List[Dict]:
         return []
     
     try:
-        response = supabase.table('chat_history').select('*').order('timestamp').execute()
+        response = supabase.table('chat_history').select('id, role, content').order('timestamp').execute()
+        # Snapshot chat berupa list berurutan, karena pesan tidak punya key natural
+        st.session_state.setdefault('persisted_snapshots', {})['chat_history'] = [
+            {'id': item['id'], 'role': item['role'], 'content': item['content']} for item in response.data
+        ]
         return [{'role': item['role'], 'content': item['content']} for item in response.data]
     except Exception as e:
         logger.error(f"Error loading chat history from Supabase: {e}")
@@ -296,29 +550,78 @@ def load_chat_history() -> List[Dict]:
 
 
 def save_chat_history(history: List[Dict]) -> bool:
-    """Save chat history to Supabase"""
+    """
+    Save chat history to Supabase.
+    Messages shared with the persisted snapshot are kept; only the diverging tail
+    is deleted (one call) and the new messages are inserted (one call).
+    Nothing is written when the persisted history cannot be loaded.
+    """
     supabase = get_supabase_client()
     if not supabase:
         return False
     
     try:
-        # Delete all existing history first
-        supabase.table('chat_history').delete().neq('id', 0).execute()
-        
-        # Insert new history
-        for msg in history:
-            supabase.table('chat_history').insert({
-                'role': msg['role'],
-                'content': msg['content'],
-                'timestamp': datetime.now().isoformat()
-            }).execute()
+        snapshots = st.session_state.setdefault('persisted_snapshots', {})
+        if 'chat_history' not in snapshots:
+            load_chat_history()
+        if 'chat_history' not in snapshots:
+            # Load gagal: tanpa snapshot semua pesan akan dianggap baru dan tersimpan ganda
+            logger.error("Chat history not saved: persisted history could not be loaded")
+            return False
+        persisted = snapshots['chat_history']
+        
+        # Cari prefix yang sama antara history di session dan yang sudah tersimpan
+        common = 0
+        while (common < len(persisted) and common < len(history)
+               and persisted[common]['role'] == history[common]['role']
+               and persisted[common]['content'] == history[common]['content']):
+            common += 1
+        
+        stale_ids = [row['id'] for row in persisted[common:]]
+        new_messages = history[common:]
+        kept = persisted[:common]
+        
+        if stale_ids:
+            supabase.table('chat_history').delete().in_('id', stale_ids).execute()
+        
+        if new_messages:
+            # Timestamp dibuat berurutan agar urutan tetap benar saat dimuat ulang
+            base_time = datetime.now()
+            response = supabase.table('chat_history').insert([
+                {
+                    'role': msg['role'],
+                    'content': msg['content'],
+                    'timestamp': (base_time + timedelta(microseconds=offset)).isoformat()
+                }
+                for offset, msg in enumerate(new_messages)
+            ]).execute()
+            kept = kept + [
+                {'id': item['id'], 'role': item['role'], 'content': item['content']} for item in response.data
+            ]
         
+        snapshots['chat_history'] = kept
         return True
     except Exception as e:
         logger.error(f"Error saving chat history to Supabase: {e}")
+        _forget_table_snapshot('chat_history', empty=False)
         return False
 
 
+def ensure_result_id(result: Dict) -> str:
+    """Assign a stable ID to a result so it can be persisted incrementally."""
+    if not result.get('result_id'):
+        result['result_id'] = uuid.uuid4().hex
+    return result['result_id']
+
+
+def _result_rows(results: List[Dict]) -> Dict[str, Dict]:
+    """Build batch_results rows keyed by result_id."""
+    return {
+        ensure_result_id(result): {'result_id': result['result_id'], 'result_data': json.dumps(result)}
+        for result in results
+    }
+
+
 def load_results_from_disk() -> List[Dict]:
     """Load batch results from Supabase"""
     supabase = get_supabase_client()
@@ -326,41 +629,48 @@ def load_results_from_disk() -> List[Dict]:
         return []
     
     try:
-        response = supabase.table('batch_results').select('*').execute()
-        return [json.loads(item['result_data']) for item in response.data]
+        response = supabase.table('batch_results').select('result_id, result_data').order('id').execute()
+        results = []
+        for item in response.data:
+            result = json.loads(item['result_data'])
+            # Baris lama belum menyimpan result_id di dalam result_data
+            result['result_id'] = result.get('result_id') or item['result_id']
+            results.append(result)
+        _remember_table_snapshot('batch_results', _result_rows(results))
+        return results
     except Exception as e:
         logger.error(f"Error loading results from Supabase: {e}")
         return []
 
 
 def save_results_to_disk() -> bool:
-    """Save batch results to Supabase"""
+    """
+    Save batch results to Supabase incrementally.
+    Only new or changed results are written (one bulk upsert), and results that
+    are no longer in the session are removed with a single delete.
+    """
     supabase = get_supabase_client()
     if not supabase:
         return False
     
     try:
         results = st.session_state.get('batch_results', [])
-        
-        # Delete all existing results first
-        supabase.table('batch_results').delete().neq('id', 0).execute()
-        
-        # Insert new results
-        for idx, result in enumerate(results):
-            supabase.table('batch_results').insert({
-                'result_id': str(idx),
-                'result_data': json.dumps(result),
-                'updated_at': datetime.now().isoformat()
-            }).execute()
-        
+        sync_table_rows(supabase, 'batch_results', 'result_id', _result_rows(results), timestamp_column='updated_at')
         return True
     except Exception as e:
         logger.error(f"Error saving results to Supabase: {e}")
+        _forget_table_snapshot('batch_results', empty=False)
         return False
 
 
 def clear_all_persistent_data():
-    """Clear analysis memory, chat history, and batch results from Supabase. Keep roles data intact."""
+    """
+    Clear analysis memory, chat history, and batch results from Supabase, plus the
+    local disk caches (CV files, extracted text, analyses). Keep roles data intact.
+    """
+    # Cache lokal berisi isi CV, jadi selalu dihapus walaupun Supabase tidak tersedia
+    clear_disk_caches()
+    
     supabase = get_supabase_client()
     if not supabase:
         return False
@@ -370,6 +680,8 @@ def clear_all_persistent_data():
         supabase.table('analysis_memory').delete().neq('candidate_id', '').execute()
         supabase.table('chat_history').delete().neq('id', 0).execute()
         supabase.table('batch_results').delete().neq('id', 0).execute()
+        for table in ('analysis_memory', 'chat_history', 'batch_results'):
+            _forget_table_snapshot(table)
         
         # Clear session state
         keys_to_clear = ['batch_results', 'chat_history']
@@ -413,6 +725,159 @@ def import_all_data(data: dict) -> bool:
         return False
 
 
+# --- 2.5 CACHE LOKAL DI DISK ---
+# Cache persisten per mesin untuk hasil yang mahal (download CV, dll).
+# Isi disimpan per SHA-256 (blob yang sama hanya disimpan sekali), index JSON
+# ditulis atomik, dan entri yang paling lama tidak dipakai dibuang saat penuh.
+def _private_cache_dir() -> Path:
+    """
+    Cache root readable only by the current user (mode 0700). The default lives
+    in a per-user directory under the temp dir; if that path is not ours (e.g.
+    created beforehand by another user, or a symlink), a fresh private temp
+    directory is used instead.
+    """
+    configured = os.environ.get('RECRUITMENT_CACHE_DIR')
+    if configured:
+        path = Path(configured)
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        return path
+    
+    if not hasattr(os, 'getuid'):
+        # Windows: direktori temp sudah per user
+        path = Path(tempfile.gettempdir()) / 'recruitment_cache'
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    path = Path(tempfile.gettempdir()) / f"recruitment_cache-{os.getuid()}"
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+        if stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid():
+            if stat.S_IMODE(info.st_mode) != 0o700:
+                os.chmod(path, 0o700)
+            return path
+        logger.warning(f"Cache directory {path} is not owned by this user; using a private temporary directory")
+    except OSError as e:
+        logger.warning(f"Cannot use cache directory {path}: {e}")
+    return Path(tempfile.mkdtemp(prefix='recruitment_cache-'))
+
+
+CACHE_DIR = _private_cache_dir()
+
+
+class DiskCache:
+    """Persistent key -> (bytes, metadata) store with LRU eviction by total size."""
+    
+    instances: List['DiskCache'] = []
+
+    def __init__(self, name: str, max_bytes: int):
+        self.root = CACHE_DIR / name
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict]] = None
+        DiskCache.instances.append(self)
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.root / 'blobs' / f"{sha256}.bin"
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if self._index is None:
+            try:
+                with open(self.root / 'index.json', 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f"index.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.root / 'index.json')
+
+    def _drop(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry and not any(e['sha256'] == entry['sha256'] for e in self._index.values()):
+            try:
+                self._blob_path(entry['sha256']).unlink()
+            except OSError:
+                pass
+
+    def _evict(self):
+        blob_sizes = {e['sha256']: e['size'] for e in self._index.values()}
+        total = sum(blob_sizes.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            sha256 = self._index[key]['sha256']
+            self._drop(key)
+            if sha256 in blob_sizes and not any(e['sha256'] == sha256 for e in self._index.values()):
+                total -= blob_sizes.pop(sha256)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        """Return (data, meta) for a key, or None when missing or corrupt."""
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            try:
+                data = self._blob_path(entry['sha256']).read_bytes()
+            except OSError:
+                data = None
+            if data is None or hashlib.sha256(data).hexdigest() != entry['sha256']:
+                self._drop(key)
+                self._save_index()
+                return None
+            entry['last_used'] = time.time()
+            return data, dict(entry['meta'])
+
+    def put(self, key: str, data: bytes, meta: Optional[Dict] = None) -> str:
+        """Store data under key and return its SHA-256."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            index = self._load_index()
+            blob_path = self._blob_path(sha256)
+            if not blob_path.exists():
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = blob_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, blob_path)
+            old_entry = index.get(key)
+            if old_entry and old_entry['sha256'] != sha256:
+                self._drop(key)
+            index[key] = {'sha256': sha256, 'size': len(data), 'meta': meta or {}, 'last_used': time.time()}
+            self._evict()
+            self._save_index()
+        return sha256
+
+    def update_meta(self, key: str, **meta):
+        """Merge fields into the metadata of an existing entry."""
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry is not None:
+                entry['meta'].update(meta)
+                entry['last_used'] = time.time()
+                self._save_index()
+
+    def clear(self):
+        """Remove every entry and blob, including blobs no longer in the index."""
+        with self._lock:
+            self._index = {}
+            shutil.rmtree(self.root / 'blobs', ignore_errors=True)
+            self._save_index()
+
+
+def clear_disk_caches():
+    """Empty every local disk cache (downloaded CVs, extracted text, analyses)."""
+    for cache in DiskCache.instances:
+        try:
+            cache.clear()
+        except OSError as e:
+            logger.warning(f"Could not clear cache {cache.root}: {e}")
+
+
 # --- 3. FUNGSI ANALISIS RESUME (IMPROVED FOR ACCURACY) ---
 def extract_skills_from_requirements(requirements: str) -> List[str]:
     """
@@ -464,20 +929,90 @@ def extract_skills_from_requirements(requirements: str) -> List[str]:
     return list(skills)
 
 
-def calculate_skills_match_percentage(resume_text: str, required_skills: List[str]) -> Tuple[int, List[str], List[str]]:
+class SubstringMatcher:
     """
-    Calculate skill match percentage based on actual skills from requirements.
-    Returns: (percentage, matching_skills, missing_skills)
-    IMPROVED: More strict matching logic to avoid ambiguity.
+    Aho-Corasick automaton over many patterns.
+    find() reports every pattern occurring as a substring of the text in a single
+    pass, so the cost is linear in the text length regardless of pattern count.
     """
-    if not required_skills:
-        return 0, [], []
-    
-    resume_lower = resume_text.lower()
-    
-    matching_skills = []
-    missing_skills = []
     
+    def __init__(self, patterns):
+        self.patterns = tuple(dict.fromkeys(p for p in patterns if p))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+        
+        # Trie
+        for pattern in self.patterns:
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = self._output[state] + (pattern,)
+        
+        # Failure links (BFS), outputs of suffix states are merged in
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def find(self, text: str) -> set:
+        """Return the set of patterns that occur in text."""
+        goto, fail, output = self._goto, self._fail, self._output
+        remaining = len(self.patterns)
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for pattern in output[state]:
+                    if pattern not in found:
+                        found.add(pattern)
+                        remaining -= 1
+                if not remaining:
+                    break
+        return found
+
+
+@dataclass(frozen=True)
+class SkillNeedle:
+    """A required skill prepared for matching: original text, normalized phrase and significant words."""
+    skill: str
+    phrase: str
+    words: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class RoleProfile:
+    """
+    Requirements of a role compiled once for scoring many resumes.
+    Keyed by requirements_hash, so editing a role produces a new profile.
+    """
+    requirements_hash: str
+    required_skills: Tuple[str, ...]
+    needles: Tuple[SkillNeedle, ...]
+    matcher: SubstringMatcher = field(compare=False, repr=False)
+    # Skill satu huruf (C, R) tidak menjadi needle, tetapi barisnya tetap dipertahankan
+    short_skills: FrozenSet[str] = frozenset()
+
+
+def prepare_skill_needles(required_skills: List[str]) -> Tuple[SkillNeedle, ...]:
+    """Normalize skills and split out their significant words (> 3 chars)."""
+    needles = []
     for skill in required_skills:
         skill_lower = skill.lower().strip()
         
@@ -485,34 +1020,105 @@ def calculate_skills_match_percentage(resume_text: str, required_skills: List[st
         if len(skill_lower) < 3:
             continue
         
+        skill_words = tuple(w.strip() for w in skill_lower.split() if len(w.strip()) > 3)
+        needles.append(SkillNeedle(skill=skill, phrase=skill_lower, words=skill_words))
+    return tuple(needles)
+
+
+def build_needle_matcher(needles: Tuple[SkillNeedle, ...]) -> SubstringMatcher:
+    """One automaton for every skill phrase and every significant skill word."""
+    patterns = []
+    for needle in needles:
+        patterns.append(needle.phrase)
+        patterns.extend(needle.words)
+    return SubstringMatcher(patterns)
+
+
+def extract_short_skills(requirements: str) -> FrozenSet[str]:
+    """Standalone one-letter skill names such as 'C' or 'R' (lowercased)."""
+    return frozenset(match.lower() for match in re.findall(r'(?<![\w.+#-])[A-Z](?![\w.+#-])', requirements))
+
+
+def requirements_hash(requirements: str) -> str:
+    """Stable hash of a requirements text."""
+    return hashlib.sha256(requirements.encode('utf-8')).hexdigest()
+
+
+ROLE_PROFILE_CACHE_SIZE = 64
+_ROLE_PROFILES: "OrderedDict[str, RoleProfile]" = OrderedDict()
+_ROLE_PROFILES_LOCK = threading.Lock()
+
+
+def get_role_profile(requirements: str) -> RoleProfile:
+    """Return the compiled profile for a requirements text, building it on first use."""
+    key = requirements_hash(requirements)
+    with _ROLE_PROFILES_LOCK:
+        profile = _ROLE_PROFILES.get(key)
+        if profile is not None:
+            _ROLE_PROFILES.move_to_end(key)
+            return profile
+    
+    required_skills = extract_skills_from_requirements(requirements)
+    needles = prepare_skill_needles(required_skills)
+    profile = RoleProfile(
+        requirements_hash=key,
+        required_skills=tuple(required_skills),
+        needles=needles,
+        matcher=build_needle_matcher(needles),
+        short_skills=extract_short_skills(requirements)
+    )
+    
+    with _ROLE_PROFILES_LOCK:
+        _ROLE_PROFILES[key] = profile
+        while len(_ROLE_PROFILES) > ROLE_PROFILE_CACHE_SIZE:
+            _ROLE_PROFILES.popitem(last=False)
+    return profile
+
+
+def warm_role_profiles(roles: Dict[str, str]):
+    """Compile profiles for all roles so scoring a batch does no requirements parsing."""
+    for requirements in roles.values():
+        if requirements:
+            get_role_profile(requirements)
+
+
+def match_skill_needles(resume: Union[str, 'ResumeDocument'], needles: Tuple[SkillNeedle, ...],
+                        matcher: SubstringMatcher) -> Tuple[int, List[str], List[str]]:
+    """
+    Classify prepared skills as matching or missing in a resume.
+    All phrases and words are located by one pass of matcher over the resume,
+    shared with other stages through ResumeDocument.find().
+    Returns: (percentage, matching_skills, missing_skills)
+    """
+    found = as_resume_document(resume).find(matcher) if needles else set()
+    matching_skills = []
+    missing_skills = []
+    
+    for needle in needles:
         is_matched = False
         
         # Method 1: Exact phrase match (most reliable)
-        if skill_lower in resume_lower:
+        if needle.phrase in found:
             is_matched = True
-        else:
+        elif needle.words:
             # Method 2: Check if majority of significant words in skill are present
-            skill_words = [w.strip() for w in skill_lower.split() if len(w.strip()) > 3]
+            words_found = sum(1 for word in needle.words if word in found)
             
-            if skill_words:
-                # Count how many significant words are found
-                words_found = sum(1 for word in skill_words if word in resume_lower)
-                
-                # Require at least 70% of significant words to be present
-                match_ratio = words_found / len(skill_words)
-                
-                # For skills with only 1-2 significant words, require exact match
-                # For skills with 3+ words, allow 70% match
-                if len(skill_words) <= 2:
-                    is_matched = (match_ratio >= 1.0)  # All words must match
-                else:
-                    is_matched = (match_ratio >= 0.7)  # At least 70% words match
+            # Require at least 70% of significant words to be present
+            match_ratio = words_found / len(needle.words)
+            
+            # For skills with only 1-2 significant words, require exact match
+            # For skills with 3+ words, allow 70% match
+            if len(needle.words) <= 2:
+                is_matched = (match_ratio >= 1.0)  # All words must match
+            else:
+                is_matched = (match_ratio >= 0.7)  # At least 70% words match
         
         # Add to appropriate list (STRICT: no overlap allowed)
         if is_matched:
-            matching_skills.append(skill)
+            matching_skills.append(needle.skill)
         else:
-            missing_skills.append(skill)
+            missing_skills.append(needle.skill)
     
     # Calculate percentage
     total_skills = len(matching_skills) + len(missing_skills)
@@ -522,103 +1128,178 @@ def calculate_skills_match_percentage(resume_text: str, required_skills: List[st
     return percentage, matching_skills, missing_skills
 
 
-def extract_work_experience_duration(resume_text: str) -> int:
+def calculate_skills_match_percentage(resume_text: str, required_skills: List[str]) -> Tuple[int, List[str], List[str]]:
     """
-    Extract and calculate total work experience duration from resume.
-    Looks for date patterns and calculates total years of experience.
-    """
-    resume_lower = resume_text.lower()
-    
-    # Pattern untuk mendeteksi rentang tanggal dalam berbagai format
-    # Format: "Jan 2020 - Dec 2022", "January 2020 - December 2022", "2020 - 2022", "2020-2022", dll
-    date_patterns = [
-        # Format: Month Year - Month Year (e.g., "Jan 2020 - Dec 2022")
-        r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s*\.?\s*(\d{4})\s*[-–—to]+\s*(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s*\.?\s*(\d{4})',
-        # Format: Year - Year (e.g., "2020 - 2022", "2020-2022")
-        r'(\d{4})\s*[-–—]+\s*(\d{4})',
-        # Format: Month Year - Present/Sekarang
-        r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s*\.?\s*(\d{4})\s*[-–—to]+\s*(?:present|sekarang|now|current|ongoing)',
-        # Format: Year - Present/Sekarang
-        r'(\d{4})\s*[-–—]+\s*(?:present|sekarang|now|current|ongoing)',
-    ]
+    Calculate skill match percentage based on actual skills from requirements.
+    Returns: (percentage, matching_skills, missing_skills)
+    IMPROVED: More strict matching logic to avoid ambiguity.
+    """
+    if not required_skills:
+        return 0, [], []
     
-    total_months = 0
-    found_ranges = []
-    current_year = datetime.now().year
+    needles = prepare_skill_needles(required_skills)
+    return match_skill_needles(resume_text, needles, build_needle_matcher(needles))
+
+
+# Pattern untuk mendeteksi rentang tanggal dalam berbagai format, dalam SATU regex:
+# "Jan 2020 - Dec 2022", "January 2020 - Present", "2020 - 2022", "Mei 2019 s/d Sekarang", dll
+_MONTH_NAMES = (r'jan(?:uari|uary)?|feb(?:ruari|ruary)?|mar(?:et|ch)?|apr(?:il)?|may|mei|jun(?:i|e)?|jul(?:i|y)?'
+                r'|aug(?:ust)?|ag(?:u)?s(?:tus)?|sep(?:t(?:ember)?)?|o[ck]t(?:ober)?|nov(?:ember)?|de[cs](?:ember)?')
+DATE_RANGE_PATTERN = re.compile(
+    rf'(?:\b(?P<start_month>{_MONTH_NAMES})\s*\.?\s*)?(?<!\d)(?P<start_year>\d{{4}})(?!\d)'
+    r'\s*(?:[-–—]+|to|s/d|s\.d\.?|sampai(?:\s+dengan)?|hingga)\s*'
+    rf'(?:(?:\b(?P<end_month>{_MONTH_NAMES})\s*\.?\s*)?(?<!\d)(?P<end_year>\d{{4}})(?!\d)'
+    r'|(?P<present>present|sekarang|now|current|ongoing|saat\s+ini))',
+    re.IGNORECASE
+)
+_MONTH_NUMBERS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'mei': 5, 'jun': 6, 'jul': 7,
+    'aug': 8, 'agu': 8, 'ags': 8, 'sep': 9, 'oct': 10, 'okt': 10, 'nov': 11, 'dec': 12, 'des': 12,
+}
+
+
+def _month_number(name: Optional[str]) -> Optional[int]:
+    """Month number (1-12) from an English or Indonesian month name."""
+    return _MONTH_NUMBERS.get(name[:3].lower()) if name else None
+
+
+def scan_date_spans(resume_lower: str) -> List[Tuple[int, int]]:
+    """
+    Find every date range in one pass and return them as month intervals
+    [start, end) counted as year * 12 + month index.
+    A named end month is inclusive ("Jan 2020 - Dec 2021" = 24 months); a bare end
+    year closes at the start of that year ("2020 - 2022" = 24 months).
+    Implausible ranges (before 1970, in the future, reversed) are dropped.
+    """
+    now = datetime.now()
+    now_index = now.year * 12 + now.month
+    spans = []
+    for match in DATE_RANGE_PATTERN.finditer(resume_lower):
+        start_year = int(match.group('start_year'))
+        start_month = _month_number(match.group('start_month'))
+        if match.group('present'):
+            end_year = now.year
+            end_index = now_index
+        else:
+            end_year = int(match.group('end_year'))
+            end_month = _month_number(match.group('end_month'))
+            end_index = end_year * 12 + (end_month if end_month else 0)
+        start_index = start_year * 12 + ((start_month - 1) if start_month else 0)
+        
+        # Validasi tahun (harus masuk akal)
+        if not (1970 <= start_year <= now.year and 1970 <= end_year <= now.year):
+            continue
+        end_index = min(end_index, now_index)
+        if start_index <= end_index:
+            spans.append((start_index, end_index))
+    return spans
+
+
+def merge_month_spans(spans: List[Tuple[int, int]]) -> int:
+    """Total months covered by the spans, counting overlapping periods only once."""
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(spans):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+EDUCATION_KEYWORDS = ['bachelor', 'master', 'phd', 'sarjana', 's1', 's2', 's3', 'degree', 'university', 'universitas', 'diploma']
+EXPERIENCE_KEYWORDS = ['year', 'tahun', 'experience', 'pengalaman', 'worked', 'bekerja', 'work history', 'employment']
+CERT_KEYWORDS = ['certificate', 'certification', 'sertifikat', 'certified', 'licensed', 'lisence', 'sertifikat']
+_SCORING_KEYWORD_MATCHER = SubstringMatcher(EDUCATION_KEYWORDS + EXPERIENCE_KEYWORDS + CERT_KEYWORDS)
+
+
+class ResumeDocument:
+    """
+    A resume normalized once and shared by every scoring stage.
+    Derived views (date spans, matcher hits) are computed lazily and cached,
+    so no stage re-lowercases or re-scans the text: skill matching and the
+    education/experience/certification keywords both go through find().
+    """
     
-    for pattern in date_patterns:
-        matches = re.finditer(pattern, resume_lower, re.IGNORECASE)
-        for match in matches:
-            try:
-                if 'present' in pattern or 'sekarang' in pattern:
-                    # Handle "Year - Present" format
-                    start_year = int(match.group(1))
-                    end_year = current_year
-                else:
-                    # Handle "Year - Year" format
-                    start_year = int(match.group(1))
-                    end_year = int(match.group(2))
-                
-                # Validasi tahun (harus masuk akal)
-                if 1970 <= start_year <= current_year and 1970 <= end_year <= current_year:
-                    if start_year <= end_year:
-                        duration_years = end_year - start_year
-                        # Konversi ke bulan (asumsi rata-rata 12 bulan per tahun)
-                        duration_months = duration_years * 12
-                        
-                        # Hindari duplikasi dengan cek overlap
-                        is_duplicate = False
-                        for existing_range in found_ranges:
-                            if abs(existing_range[0] - start_year) <= 1 and abs(existing_range[1] - end_year) <= 1:
-                                is_duplicate = True
-                                break
-                        
-                        if not is_duplicate:
-                            found_ranges.append((start_year, end_year))
-                            total_months += duration_months
-            except (ValueError, IndexError):
-                continue
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        # Kunci = objek matcher itu sendiri (bukan id()), agar tidak tertukar setelah GC
+        self._matches: Dict[SubstringMatcher, set] = {}
+    
+    def find(self, matcher: SubstringMatcher) -> set:
+        """Patterns of matcher found in the lowercased text (one scan per matcher)."""
+        if matcher not in self._matches:
+            self._matches[matcher] = matcher.find(self.lower)
+        return self._matches[matcher]
+    
+    @cached_property
+    def date_spans(self) -> List[Tuple[int, int]]:
+        """Date ranges as month intervals, see scan_date_spans()."""
+        return scan_date_spans(self.lower)
+
+
+def as_resume_document(resume) -> ResumeDocument:
+    """Accept either raw resume text or an already prepared ResumeDocument."""
+    return resume if isinstance(resume, ResumeDocument) else ResumeDocument(resume)
+
+
+def extract_work_experience_months(resume: Union[str, ResumeDocument]) -> int:
+    """
+    Total months of work experience: date ranges are merged with a sort-and-sweep
+    so overlapping positions are counted once. Falls back to the largest
+    "N tahun / N years" mention when no date range is found.
+    """
+    doc = as_resume_document(resume)
+    
+    total_months = merge_month_spans(doc.date_spans)
     
     # Jika tidak menemukan pola tanggal, coba metode lama sebagai fallback
     if total_months == 0:
-        years_match = re.findall(r'(\d+)\s*(?:tahun|year|years|yr)', resume_lower)
+        years_match = re.findall(r'(\d+)\s*(?:tahun|year|years|yr)', doc.lower)
         if years_match:
             total_months = max([int(y) for y in years_match], default=0) * 12
     
-    # Konversi total bulan ke tahun
-    total_years = total_months // 12
-    
-    return total_years
+    return total_months
+
+
+def extract_work_experience_duration(resume: Union[str, ResumeDocument]) -> int:
+    """
+    Extract and calculate total work experience duration from resume.
+    Returns whole years, see extract_work_experience_months().
+    """
+    return extract_work_experience_months(resume) // 12
 
 
-def calculate_consistent_score(resume_text: str, requirements: str) -> Dict:
+def calculate_consistent_score(resume: Union[str, ResumeDocument], requirements: str) -> Dict:
     """
     Calculate a deterministic baseline score based on actual skill requirements.
     This is the CORE IMPROVEMENT for accurate percentage calculation.
+    Accepts raw text or a ResumeDocument built once per CV.
     """
-    resume_lower = resume_text.lower()
-    requirements_lower = requirements.lower()
+    doc = as_resume_document(resume)
     
-    # Extract skills from requirements
-    required_skills = extract_skills_from_requirements(requirements)
+    # Skills from the precompiled role profile (no requirements parsing per resume)
+    profile = get_role_profile(requirements)
+    required_skills = list(profile.required_skills)
     
     # Calculate skill match percentage
-    skill_percentage, matching_skills, missing_skills = calculate_skills_match_percentage(resume_text, required_skills)
-    
-    # Check for education keywords
-    education_keywords = ['bachelor', 'master', 'phd', 'sarjana', 's1', 's2', 's3', 'degree', 'university', 'universitas', 'diploma']
-    education_match = any(kw in resume_lower for kw in education_keywords)
+    skill_percentage, matching_skills, missing_skills = match_skill_needles(doc, profile.needles, profile.matcher)
     
-    # Check for experience keywords and calculate years using improved method
-    experience_keywords = ['year', 'tahun', 'experience', 'pengalaman', 'worked', 'bekerja', 'work history', 'employment']
-    has_experience = any(kw in resume_lower for kw in experience_keywords)
+    # Education, experience and certification keywords in one pass over the resume
+    keywords_found = doc.find(_SCORING_KEYWORD_MATCHER)
+    education_match = any(kw in keywords_found for kw in EDUCATION_KEYWORDS)
+    has_experience = any(kw in keywords_found for kw in EXPERIENCE_KEYWORDS)
     
     # Use improved experience calculation that analyzes date ranges
-    years_of_experience = extract_work_experience_duration(resume_text)
+    months_of_experience = extract_work_experience_months(doc)
+    years_of_experience = months_of_experience // 12
     
-    # Check for certifications
-    cert_keywords = ['certificate', 'certification', 'sertifikat', 'certified', 'licensed', 'lisence', 'sertifikat']
-    has_certifications = any(kw in resume_lower for kw in cert_keywords)
+    has_certifications = any(kw in keywords_found for kw in CERT_KEYWORDS)
     
     # Calculate weighted score
     score = 0
@@ -648,6 +1329,7 @@ def calculate_consistent_score(resume_text: str, requirements: str) -> Dict:
         'education_match': education_match,
         'has_experience': has_experience,
         'years_of_experience': years_of_experience,
+        'months_of_experience': months_of_experience,
         'has_certifications': has_certifications,
         'required_skills': required_skills,
         'matching_skills': matching_skills,
@@ -678,9 +1360,26 @@ def extract_json_from_response(response: str) -> dict:
         raise ValueError(f"Invalid JSON in AI response: {str(e)}")
 
 def validate_analysis_result(result: dict) -> bool:
-    """Validate that the analysis result has all required fields."""
+    """Validate that the analysis result has all required fields with usable types."""
     required_fields = ['selected', 'feedback', 'candidate_name']
-    return all(field in result for field in required_fields)
+    if not all(field in result for field in required_fields):
+        return False
+    
+    # Nilai null/angka dari AI akan gagal saat diproses (.startswith, .lower, int())
+    if not isinstance(result['feedback'], str) or not isinstance(result['candidate_name'], str):
+        return False
+    for field in ('matching_skills', 'missing_skills'):
+        if field in result and not (isinstance(result[field], list)
+                                    and all(isinstance(skill, str) for skill in result[field])):
+            return False
+    if 'match_percentage' in result:
+        match_percentage = result['match_percentage']
+        if isinstance(match_percentage, bool):
+            return False
+        if isinstance(match_percentage, str):
+            return match_percentage.strip().isdigit()
+        return isinstance(match_percentage, (int, float))
+    return True
 
 def save_to_memory(result: dict):
     """Save analysis result to memory for chatbot context."""
@@ -732,108 +1431,347 @@ def save_to_memory(result: dict):
 
 
 # --- 4. FUNGSI EKSTRAKSI PDF & OCR ---
-def extract_text_from_pdf(pdf_file) -> str:
-    """Extract text from PDF file."""
-    try:
-        pdf_file.seek(0)
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        # PERBAIKAN: Reset pointer setelah selesai membaca
-        pdf_file.seek(0)
-        return text.strip()
-    except Exception as e:
-        logger.error(f"PDF extraction error: {e}")
-        # PERBAIKAN: Reset pointer jika error terjadi
+MAX_OCR_FILE_SIZE = 10_000_000  # 10 MB
+MAX_OCR_PAGES = 10
+# Halaman dengan teks lebih sedikit dari ini dianggap hasil scan dan di-OCR
+OCR_PAGE_MIN_CHARS = 40
+# Jumlah dokumen yang diekstrak bersamaan oleh pipeline batch (lihat bagian 8.5)
+EXTRACTION_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Halaman yang di-OCR bersamaan per dokumen: dibagi dengan jumlah dokumen paralel,
+# sehingga total proses pdftoppm/tesseract tidak melebihi jumlah CPU
+OCR_MAX_WORKERS = max(1, (os.cpu_count() or 1) // EXTRACTION_MAX_WORKERS)
+# Profil OCR: kecepatan vs akurasi. psm 6 = satu blok teks (cepat), psm 3 = layout otomatis;
+# oem 1 = mesin LSTM. Bahasa yang tidak terpasang di tesseract dilewati.
+OCR_PROFILES = {
+    'fast': {'dpi': 150, 'grayscale': True, 'binarize': False, 'psm': 6, 'oem': 1, 'lang': 'ind+eng'},
+    'balanced': {'dpi': 200, 'grayscale': True, 'binarize': False, 'psm': 3, 'oem': 1, 'lang': 'ind+eng'},
+    'accurate': {'dpi': 300, 'grayscale': True, 'binarize': True, 'psm': 3, 'oem': 1, 'lang': 'ind+eng'},
+}
+DEFAULT_OCR_PROFILE = 'balanced'
+OCR_BINARIZE_THRESHOLD = 160
+# Satu thread per proses tesseract; paralelisme diatur per halaman oleh OCR_MAX_WORKERS
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Backend ekstraksi teks: fungsi pdf_bytes -> [teks per halaman], dicoba berurutan.
+# pdfium tidak thread-safe, jadi aksesnya diserialkan per proses.
+_PDFIUM_LOCK = threading.Lock()
+
+def _pypdfium2_page_texts(pdf_bytes: bytes) -> List[str]:
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_bytes)
         try:
-            pdf_file.seek(0)
-        except:
-            pass
-        return ""
+            page_texts = []
+            for page_index in range(len(pdf)):
+                page = pdf[page_index]
+                text_page = page.get_textpage()
+                page_texts.append(text_page.get_text_range())
+                text_page.close()
+                page.close()
+            return page_texts
+        finally:
+            pdf.close()
 
-def extract_text_with_ocr(pdf_file) -> Tuple[str, bool]:
-    """Extract text from PDF with OCR fallback for image-based PDFs."""
-    # First try normal extraction
-    text = extract_text_from_pdf(pdf_file)
-    
-    # If text is too short, it might be an image-based PDF
-    if len(text.strip()) < 100 and OCR_AVAILABLE:
+def _pypdf2_page_texts(pdf_bytes: bytes) -> List[str]:
+    reader = PyPDF2.PdfReader(BytesIO(pdf_bytes))
+    return [page.extract_text() or "" for page in reader.pages]
+
+def _pdfminer_page_texts(pdf_bytes: bytes) -> List[str]:
+    resource_manager = PDFResourceManager(caching=True)
+    page_texts = []
+    for page in PDFPage.get_pages(BytesIO(pdf_bytes)):
+        output = StringIO()
+        device = TextConverter(resource_manager, output, laparams=LAParams())
         try:
-            # PERBAIKAN: Reset file pointer dan baca bytes untuk OCR
-            pdf_file.seek(0)
-            pdf_bytes = pdf_file.read()
-            
-            # PERBAIKAN: Pastikan kita punya data
-            if not pdf_bytes or len(pdf_bytes) == 0:
-                logger.error("PDF file is empty for OCR")
-                return text, False
-            
-            # PERBAIKAN CRITICAL: Batasi ukuran file untuk OCR (max 10 MB)
-            file_size_mb = len(pdf_bytes) / 1_000_000
-            MAX_OCR_FILE_SIZE = 10_000_000  # 10 MB
-            
-            if len(pdf_bytes) > MAX_OCR_FILE_SIZE:
-                logger.warning(f"PDF too large for OCR: {file_size_mb:.1f} MB > 10 MB")
-                st.warning(f"⚠️ PDF terlalu besar ({file_size_mb:.1f} MB) untuk OCR. Menggunakan ekstraksi normal.")
-                # Reset pointer dan return hasil ekstraksi normal
-                try:
-                    pdf_file.seek(0)
-                except:
-                    pass
-                return text, False
-            
-            # PERBAIKAN: Reset pointer setelah read
-            pdf_file.seek(0)
-            
-            logger.info(f"Converting PDF to images for OCR ({len(pdf_bytes)} bytes)...")
-            images = convert_from_bytes(pdf_bytes)
-            
-            # PERBAIKAN CRITICAL: Batasi halaman OCR (max 10 halaman)
-            MAX_OCR_PAGES = 10
-            original_page_count = len(images)
-            
-            if len(images) > MAX_OCR_PAGES:
-                logger.warning(f"PDF has {len(images)} pages, limiting to {MAX_OCR_PAGES} pages for OCR")
-                st.warning(f"⚠️ PDF memiliki {len(images)} halaman. Hanya {MAX_OCR_PAGES} halaman pertama yang akan di-OCR untuk menghindari timeout.")
-                images = images[:MAX_OCR_PAGES]
-            
-            ocr_text = ""
-            for idx, img in enumerate(images):
-                logger.info(f"OCR processing page {idx+1}/{len(images)}...")
-                
-                # PERBAIKAN: Progress heartbeat setiap 3 halaman untuk avoid timeout
-                if idx > 0 and idx % 3 == 0:
-                    try:
-                        st.empty()  # Trigger Streamlit refresh untuk health check
-                    except:
-                        pass
-                
-                page_text = pytesseract.image_to_string(img)
-                ocr_text += page_text + "\n"
-            
-            if len(ocr_text.strip()) > len(text.strip()):
-                logger.info(f"OCR produced better results: {len(ocr_text)} chars vs {len(text)} chars")
-                if original_page_count > MAX_OCR_PAGES:
-                    logger.info(f"Note: Only first {MAX_OCR_PAGES} of {original_page_count} pages were OCR'd")
-                return ocr_text.strip(), True
-            else:
-                logger.info(f"Normal extraction better: {len(text)} chars vs {len(ocr_text)} chars")
+            PDFPageInterpreter(resource_manager, device).process_page(page)
+        finally:
+            device.close()
+        page_texts.append(output.getvalue())
+    return page_texts
+
+PDF_TEXT_EXTRACTORS: Dict[str, Callable[[bytes], List[str]]] = {}
+
+def register_pdf_text_extractor(name: str, extractor: Callable[[bytes], List[str]]):
+    """Add a PDF text backend; backends are tried in registration order."""
+    PDF_TEXT_EXTRACTORS[name] = extractor
+
+if PYPDFIUM2_AVAILABLE:
+    register_pdf_text_extractor('pypdfium2', _pypdfium2_page_texts)
+register_pdf_text_extractor('pypdf2', _pypdf2_page_texts)
+if PDFMINER_AVAILABLE:
+    register_pdf_text_extractor('pdfminer', _pdfminer_page_texts)
+
+def read_pdf_page_texts(pdf_file) -> List[str]:
+    """
+    Text layer of each PDF page ('' for pages without one), from the first
+    registered backend that can read the file. Raises on unreadable PDFs.
+    """
+    pdf_file.seek(0)
+    pdf_bytes = pdf_file.read()
+    # PERBAIKAN: Reset pointer setelah selesai membaca
+    pdf_file.seek(0)
+    
+    last_error = None
+    for name, extractor in PDF_TEXT_EXTRACTORS.items():
+        try:
+            return [page_text.replace('\r\n', '\n') for page_text in extractor(pdf_bytes)]
         except Exception as e:
-            logger.error(f"OCR error: {e}")
-            # PERBAIKAN: Reset pointer jika error terjadi
+            logger.warning(f"PDF text backend {name} failed: {e}")
+            last_error = e
+    raise last_error or ValueError("No PDF text extractor available")
+
+def benchmark_pdf_extractors(pdf_files: List[bytes], repeat: int = 3) -> Dict[str, Dict]:
+    """Time each registered backend on the given PDFs; returns pages, chars, seconds and pages/second."""
+    report = {}
+    for name, extractor in PDF_TEXT_EXTRACTORS.items():
+        pages = chars = 0
+        start = time.perf_counter()
+        try:
+            for _ in range(repeat):
+                for pdf_bytes in pdf_files:
+                    page_texts = extractor(pdf_bytes)
+                    pages += len(page_texts)
+                    chars += sum(len(page_text) for page_text in page_texts)
+        except Exception as e:
+            report[name] = {'error': str(e)}
+            continue
+        seconds = time.perf_counter() - start
+        report[name] = {
+            'pages': pages // repeat,
+            'chars': chars // repeat,
+            'seconds': seconds / repeat,
+            'pages_per_second': pages / seconds if seconds else float('inf'),
+        }
+    return report
+
+def join_page_texts(page_texts: List[str]) -> str:
+    return "".join(page_text + "\n" for page_text in page_texts if page_text).strip()
+
+def extract_pdf_text_pages(pdf_file) -> Tuple[str, List[str]]:
+    """
+    Extract text from PDF file. Returns (text, page_sources) where each page
+    source is 'text' or 'empty' (no text layer on that page).
+    """
+    try:
+        page_texts = read_pdf_page_texts(pdf_file)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        return "", []
+    page_sources = ['text' if page_text.strip() else 'empty' for page_text in page_texts]
+    return join_page_texts(page_texts), page_sources
+
+def extract_text_from_pdf(pdf_file) -> str:
+    """Extract text from PDF file."""
+    return extract_pdf_text_pages(pdf_file)[0]
+
+def extract_text_with_ocr(pdf_file) -> Tuple[str, bool]:
+    """Extract text from PDF with OCR fallback for image-based PDFs."""
+    text, ocr_used, _, notices = extract_text_with_ocr_pages(pdf_file)
+    for notice in notices:
+        st.warning(notice)
+    return text, ocr_used
+
+_TESSERACT_LANGUAGES: Optional[set] = None
+
+def tesseract_lang(requested: str) -> Optional[str]:
+    """Requested '+'-joined languages limited to the installed packs (None = tesseract default)."""
+    global _TESSERACT_LANGUAGES
+    if _TESSERACT_LANGUAGES is None:
+        try:
+            _TESSERACT_LANGUAGES = set(pytesseract.get_languages(config=''))
+        except Exception as e:
+            logger.warning(f"Could not list tesseract languages: {e}")
+            _TESSERACT_LANGUAGES = set()
+    available = [lang for lang in requested.split('+') if lang in _TESSERACT_LANGUAGES]
+    return '+'.join(available) or None
+
+def ocr_pdf_page(pdf_path: str, page_number: int, output_dir: str, profile: Dict) -> str:
+    """Rasterize one page to a file in output_dir, OCR it with the profile, and delete the image."""
+    image_paths = convert_from_path(
+        pdf_path,
+        dpi=profile['dpi'],
+        grayscale=profile['grayscale'],
+        first_page=page_number,
+        last_page=page_number,
+        output_folder=output_dir,
+        output_file=f"page{page_number:04d}",
+        paths_only=True
+    )
+    try:
+        if profile['binarize']:
+            binarized_paths = []
+            for image_path in image_paths:
+                with Image.open(image_path) as img:
+                    binarized = img.convert('L').point(lambda x: 255 if x > OCR_BINARIZE_THRESHOLD else 0, '1')
+                binarized.save(f"{image_path}.png")
+                binarized_paths.append(f"{image_path}.png")
+            image_paths = image_paths + binarized_paths
+            ocr_paths = binarized_paths
+        else:
+            ocr_paths = image_paths
+        
+        # pytesseract meneruskan path langsung ke tesseract, gambar tidak dimuat ke memori
+        config = f"--psm {profile['psm']} --oem {profile['oem']}"
+        lang = tesseract_lang(profile['lang'])
+        return "".join(pytesseract.image_to_string(image_path, lang=lang, config=config) for image_path in ocr_paths)
+    finally:
+        for image_path in image_paths:
             try:
-                pdf_file.seek(0)
-            except:
+                os.remove(image_path)
+            except OSError:
                 pass
+
+def ocr_pdf_pages(pdf_bytes: bytes, page_numbers: List[int], ocr_profile: str = DEFAULT_OCR_PROFILE) -> List[str]:
+    """
+    OCR the given 1-based pages concurrently, returning texts in the same order.
+    Each worker rasterizes a single page to a temp dir and frees it after OCR, so
+    memory per worker is bounded by one page. Tesseract and pdftoppm run as
+    subprocesses, so threads are enough to use every core.
+    """
+    profile = OCR_PROFILES.get(ocr_profile, OCR_PROFILES[DEFAULT_OCR_PROFILE])
+    with tempfile.TemporaryDirectory(prefix='cv_ocr_') as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, 'source.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+        if len(page_numbers) <= 1:
+            return [ocr_pdf_page(pdf_path, page_number, tmp_dir, profile) for page_number in page_numbers]
+        with ThreadPoolExecutor(max_workers=min(OCR_MAX_WORKERS, len(page_numbers)), thread_name_prefix='ocr') as pool:
+            return list(pool.map(lambda page_number: ocr_pdf_page(pdf_path, page_number, tmp_dir, profile), page_numbers))
+
+def extract_text_with_ocr_pages(pdf_file, ocr_profile: str = DEFAULT_OCR_PROFILE) -> Tuple[str, bool, List[str], List[str]]:
+    """
+    Like extract_text_with_ocr, but also returns the source of each page and
+    user-facing notices (OCR limits hit), which the caller shows in the UI.
+    Only pages whose text layer is shorter than OCR_PAGE_MIN_CHARS are OCR'd;
+    page texts are merged back in page order. Page sources: 'text', 'empty',
+    'ocr', 'skipped' (over the OCR limits) or 'ocr_failed'.
+    """
+    try:
+        page_texts = read_pdf_page_texts(pdf_file)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        page_texts = None
     
-    return text, False
+    # PERBAIKAN: Reset file pointer dan baca bytes untuk OCR
+    pdf_file.seek(0)
+    pdf_bytes = pdf_file.read()
+    pdf_file.seek(0)
+    
+    if page_texts is None:
+        # Text layer tidak terbaca: coba OCR semua halaman
+        if not OCR_AVAILABLE or not pdf_bytes:
+            return "", False, [], []
+        try:
+            page_texts = [""] * pdfinfo_from_bytes(pdf_bytes)['Pages']
+        except Exception as e:
+            logger.error(f"OCR error: {e}")
+            return "", False, [], []
+    
+    notices: List[str] = []
+    page_sources = ['text' if len(page_text.strip()) >= OCR_PAGE_MIN_CHARS else 'empty' for page_text in page_texts]
+    scanned_pages = [idx for idx, source in enumerate(page_sources) if source == 'empty']
+    
+    if not scanned_pages:
+        return join_page_texts(page_texts), False, page_sources, notices
+    
+    if not OCR_AVAILABLE:
+        for idx in scanned_pages:
+            page_sources[idx] = 'ocr_failed'
+        return join_page_texts(page_texts), False, page_sources, notices
+    
+    # PERBAIKAN CRITICAL: Batasi ukuran file untuk OCR (max 10 MB)
+    file_size_mb = len(pdf_bytes) / 1_000_000
+    if len(pdf_bytes) > MAX_OCR_FILE_SIZE:
+        logger.warning(f"PDF too large for OCR: {file_size_mb:.1f} MB > 10 MB")
+        notices.append(f"⚠️ PDF terlalu besar ({file_size_mb:.1f} MB) untuk OCR. Menggunakan ekstraksi normal.")
+        for idx in scanned_pages:
+            page_sources[idx] = 'skipped'
+        return join_page_texts(page_texts), False, page_sources, notices
+    
+    # PERBAIKAN CRITICAL: Batasi halaman OCR (max 10 halaman)
+    if len(scanned_pages) > MAX_OCR_PAGES:
+        logger.warning(f"PDF has {len(scanned_pages)} pages without text, limiting to {MAX_OCR_PAGES} pages for OCR")
+        notices.append(f"⚠️ PDF memiliki {len(scanned_pages)} halaman hasil scan. Hanya {MAX_OCR_PAGES} halaman pertama yang akan di-OCR untuk menghindari timeout.")
+        for idx in scanned_pages[MAX_OCR_PAGES:]:
+            page_sources[idx] = 'skipped'
+        scanned_pages = scanned_pages[:MAX_OCR_PAGES]
+    
+    try:
+        # Hanya halaman yang akan di-OCR yang dirender, satu per satu
+        logger.info(f"OCR for {len(scanned_pages)} of {len(page_texts)} PDF pages ({len(pdf_bytes)} bytes)...")
+        ocr_texts = ocr_pdf_pages(pdf_bytes, [idx + 1 for idx in scanned_pages], ocr_profile)
+    except Exception as e:
+        logger.error(f"OCR error: {e}")
+        for idx in scanned_pages:
+            page_sources[idx] = 'ocr_failed'
+        return join_page_texts(page_texts), False, page_sources, notices
+    
+    ocr_used = False
+    for idx, ocr_text in zip(scanned_pages, ocr_texts):
+        if len(ocr_text.strip()) > len(page_texts[idx].strip()):
+            page_texts[idx] = ocr_text
+            page_sources[idx] = 'ocr'
+            ocr_used = True
+    
+    text = join_page_texts(page_texts)
+    logger.info(f"Extracted {len(text)} chars, page sources: {page_sources}")
+    return text, ocr_used, page_sources, notices
 
 
 # --- 5. FUNGSI UNTUK MEMBUAT AGENT ---
+GEMINI_MODEL_ID = "gemini-2.0-flash-exp"  # Using Gemini 2.0 Flash (latest version)
+
+
+# Konfigurasi SDK Gemini bersifat global per proses: genai.configure() mengganti
+# client default, dan GenerativeModel mengikat client default itu pada panggilan
+# pertamanya. Panggilan dengan API key yang sama boleh berjalan bersamaan; key lain
+# menunggu sampai panggilan key aktif selesai, baru konfigurasi diganti.
+class GeminiKeyGate:
+    """Serializes the process-wide Gemini configuration between API keys."""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active_key: Optional[str] = None
+        self._active_calls = 0
+        self._waiting_other_keys = 0
+    
+    @contextmanager
+    def hold(self, api_key: Optional[str]):
+        """Run the block with genai configured for api_key."""
+        with self._condition:
+            if self._active_calls and self._active_key != api_key:
+                self._waiting_other_keys += 1
+                try:
+                    self._condition.wait_for(lambda: self._active_calls == 0)
+                finally:
+                    self._waiting_other_keys -= 1
+            else:
+                # Jangan terus menambah panggilan key aktif selagi key lain menunggu
+                self._condition.wait_for(
+                    lambda: self._active_calls == 0
+                    or (self._active_key == api_key and self._waiting_other_keys == 0)
+                )
+            if self._active_key != api_key:
+                if GENAI_CLIENT_AVAILABLE and api_key:
+                    genai.configure(api_key=api_key)
+                self._active_key = api_key
+            self._active_calls += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active_calls -= 1
+                self._condition.notify_all()
+
+
+GEMINI_KEY_GATE = GeminiKeyGate()
+
+
+def run_gemini_agent(agent: Agent, prompt: str):
+    """agent.run(prompt) with the Gemini configuration held for the agent's API key."""
+    with GEMINI_KEY_GATE.hold(getattr(getattr(agent, 'model', None), 'api_key', None)):
+        return agent.run(prompt)
+
+
 def create_resume_analyzer() -> Optional[Agent]:
     """Create resume analyzer agent with API key from session state."""
     api_key = st.session_state.get('google_api_key')
@@ -842,11 +1780,16 @@ def create_resume_analyzer() -> Optional[Agent]:
         return None
     
     try:
+        model = Gemini(
+            id=GEMINI_MODEL_ID,
+            api_key=api_key
+        )
+        if GENAI_CLIENT_AVAILABLE:
+            # get_client() phi mengembalikan model.client apa adanya jika sudah diisi, tanpa
+            # genai.configure() dan model baru per run; client-nya terikat pada run pertama
+            model.client = genai.GenerativeModel(model_name=GEMINI_MODEL_ID)
         return Agent(
-            model=Gemini(
-                id="gemini-2.0-flash-exp",  # Using Gemini 2.0 Flash (latest version)
-                api_key=api_key
-            ),
+            model=model,
             markdown=False,
             show_tool_calls=False,
         )
@@ -856,67 +1799,266 @@ def create_resume_analyzer() -> Optional[Agent]:
         return None
 
 
-# --- 6. FUNGSI UNTUK ANALISIS RESUME (IMPROVED) ---
-def analyze_resume(
-    resume_text: str,
-    role: str,
-    analyzer: Agent,
-    max_retries: int = 3
-) -> Tuple[bool, str, Dict]:
+# Pool analyzer per (API key, model): Agent dan client Gemini-nya dipakai ulang
+# antar CV, batch dan rerun. Agent phi menyimpan state per run, jadi satu agent
+# hanya melayani satu CV pada satu waktu.
+ANALYZER_POOL_MAX_KEYS = 4
+_ANALYZER_POOL: "OrderedDict[Tuple[str, str], List[Agent]]" = OrderedDict()
+_ANALYZER_POOL_LOCK = threading.Lock()
+
+
+def _analyzer_pool_key(api_key: str) -> Tuple[str, str]:
+    return hashlib.sha256(api_key.encode()).hexdigest(), GEMINI_MODEL_ID
+
+
+def retire_resume_analyzers(api_key: Optional[str] = None):
+    """Drop pooled analyzers for one API key, or for every key when None."""
+    with _ANALYZER_POOL_LOCK:
+        if api_key is None:
+            _ANALYZER_POOL.clear()
+        else:
+            digest = _analyzer_pool_key(api_key)[0]
+            for key in [key for key in _ANALYZER_POOL if key[0] == digest]:
+                del _ANALYZER_POOL[key]
+
+
+@contextmanager
+def leased_resume_analyzer():
     """
-    Analyze resume with enhanced consistency, accuracy, and skill-based matching.
-    CORE IMPROVEMENTS: Uses actual skills from requirements for accurate percentage calculation.
+    Borrow a pooled analyzer for the session's API key (None without a key).
+    The agent goes back to the pool with its memory cleared when the block ends.
     """
+    api_key = st.session_state.get('google_api_key')
+    if not api_key:
+        yield None
+        return
     
-    roles = load_roles()
-    requirements = roles.get(role, "")
-    
-    if not requirements:
-        return False, f"Role '{role}' not found in system", {}
-    
-    lang = st.session_state.get('language', 'id')
-    feedback_lang = "Bahasa Indonesia" if lang == 'id' else "English"
-    
-    # Calculate baseline score with IMPROVED skill matching
-    baseline_analysis = calculate_consistent_score(resume_text, requirements)
-    baseline_score = baseline_analysis['score']
-    
-    # Get the actual skills for accurate matching
-    required_skills_list = baseline_analysis['required_skills']
-    matching_skills_list = baseline_analysis['matching_skills']
-    missing_skills_list = baseline_analysis['missing_skills']
+    key = _analyzer_pool_key(api_key)
+    with _ANALYZER_POOL_LOCK:
+        idle = _ANALYZER_POOL.get(key)
+        analyzer = idle.pop() if idle else None
+    if analyzer is None:
+        analyzer = create_resume_analyzer()
+        if analyzer is None:
+            yield None
+            return
     
-    resume_hash = hashlib.md5(resume_text.encode()).hexdigest()[:8]
+    try:
+        yield analyzer
+    finally:
+        analyzer.memory.clear()
+        with _ANALYZER_POOL_LOCK:
+            idle = _ANALYZER_POOL.setdefault(key, [])
+            _ANALYZER_POOL.move_to_end(key)
+            if len(idle) < LLM_MAX_CONCURRENCY:
+                idle.append(analyzer)
+            while len(_ANALYZER_POOL) > ANALYZER_POOL_MAX_KEYS:
+                _ANALYZER_POOL.popitem(last=False)
+
+
+# Rate limit permintaan ke Gemini untuk semua thread analisa (menggantikan jeda tetap)
+LLM_REQUESTS_PER_MINUTE = 30
+# Batas panggilan AI bersamaan per proses; bisa diatur lewat environment sesuai kuota API
+LLM_MAX_CONCURRENCY = max(1, int(os.environ.get('RECRUITMENT_LLM_MAX_CONCURRENCY', '4')))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+LLM_RATE_LIMITER = TokenBucket(rate=LLM_REQUESTS_PER_MINUTE / 60, capacity=LLM_MAX_CONCURRENCY)
+
+
+# --- 6. FUNGSI UNTUK ANALISIS RESUME (IMPROVED) ---
+# Hasil analisa AI yang valid disimpan per (teks resume, requirements, model, bahasa,
+# versi prompt), sehingga CV yang sama untuk role yang sama tidak memanggil Gemini lagi.
+# PENTING: naikkan PROMPT_VERSION setiap kali prompt, kondensasi resume atau aturan
+# skor/normalisasi berubah, agar hasil dari prompt lama tidak dipakai lagi.
+PROMPT_VERSION = 5
+ANALYSIS_CACHE = DiskCache('analysis', max_bytes=50_000_000)
+
+
+def analysis_cache_key(resume_text: str, requirements: str, feedback_lang: str) -> str:
+    """Cache key of an analysis: resume text hash, requirements hash, model, language and prompt version."""
+    resume_digest = hashlib.sha256(resume_text.encode()).hexdigest()
+    return f"{resume_digest}:{requirements_hash(requirements)}:{GEMINI_MODEL_ID}:{feedback_lang}:p{PROMPT_VERSION}"
+
+
+# Kondensasi resume sebelum prompt: buang baris duplikat, boilerplate dan sampah OCR,
+# lalu bila masih melebihi anggaran token, pertahankan bagian yang paling relevan.
+RESUME_TOKEN_BUDGET = 3000
+CHARS_PER_TOKEN = 4  # perkiraan kasar tokenizer Gemini
+RESUME_SECTION_KEYWORDS = {
+    'contact': ['personal', 'pribadi', 'biodata', 'contact', 'kontak'],
+    'experience': ['experience', 'pengalaman', 'employment', 'work history', 'riwayat pekerjaan', 'career', 'karir'],
+    'skills': ['skill', 'keahlian', 'keterampilan', 'kompetensi', 'competenc', 'tools', 'technical'],
+    'education': ['education', 'pendidikan', 'academic', 'akademik'],
+    'certifications': ['certif', 'sertifikat', 'sertifikasi', 'license', 'lisensi', 'training', 'pelatihan', 'course', 'kursus'],
+    'projects': ['project', 'proyek'],
+    'summary': ['summary', 'ringkasan', 'profile', 'profil', 'objective', 'tentang saya', 'about me'],
+    'organization': ['organi', 'volunteer', 'achievement', 'prestasi', 'award', 'penghargaan'],
+    'languages': ['language', 'bahasa'],
+    'low': ['hobby', 'hobbies', 'hobi', 'interest', 'minat', 'reference', 'referensi'],
+}
+# Kata pengisi yang boleh menyertai kata kunci di judul tanpa titik dua ("Work Experience",
+# "Riwayat Pendidikan"); judul lain ("Project Manager") hanya dikenali bila diakhiri ':'
+RESUME_HEADING_FILLERS = {
+    'work', 'kerja', 'professional', 'profesional', 'relevant', 'key', 'hard', 'soft',
+    'other', 'lainnya', 'riwayat', 'data', 'diri', 'information', 'informasi', 'my', 'saya',
+    'and', 'dan', '&', '/',
+}
+_RESUME_HEADING_KEYWORD = re.compile(
+    r'\b(?:' + '|'.join(
+        re.escape(keyword) for keywords in RESUME_SECTION_KEYWORDS.values() for keyword in keywords
+    ) + r')\w*'
+)
+RESUME_SECTION_SCORES = {
+    'contact': 10, 'experience': 5, 'skills': 5, 'education': 3, 'certifications': 3,
+    'projects': 3, 'summary': 2, 'organization': 1, 'languages': 1, 'other': 1, 'low': 0,
+}
+_BOILERPLATE_LINE = re.compile(
+    r'^(?:(?:page|halaman|hal\.?)\s*\d+(?:\s*(?:of|dari|/)\s*\d+)?'
+    r'|\d+\s*(?:/|of|dari)\s*\d+'
+    r'|curriculum vitae|resume|cv|daftar riwayat hidup'
+    r'|references? (?:are )?available (?:up)?on request|referensi tersedia(?: jika diminta)?)$'
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_noise_line(line: str) -> bool:
+    """Boilerplate (page numbers, 'Curriculum Vitae') or OCR garbage such as '~|= ;:'."""
+    if len(line) == 1 or _BOILERPLATE_LINE.match(line.lower()):
+        return True
+    letters = sum(ch.isalpha() for ch in line)
+    digits = sum(ch.isdigit() for ch in line)
+    if letters == 0:
+        return digits == 0
+    return len(line) >= 4 and (letters + digits + line.count(' ')) / len(line) < 0.6
+
+
+def _section_kind(line: str) -> Optional[str]:
+    """
+    Section kind if line looks like a section heading, else None. A heading either
+    ends with ':' or consists only of section keywords and filler words.
+    """
+    heading = line.strip(' :-=*#•').lower()
+    if not heading or len(heading) > 40 or len(heading.split()) > 4 or any(ch.isdigit() for ch in heading):
+        return None
+    if not line.rstrip().endswith(':'):
+        leftover = _RESUME_HEADING_KEYWORD.sub(' ', heading).split()
+        if any(word not in RESUME_HEADING_FILLERS for word in leftover):
+            return None
+    for kind, keywords in RESUME_SECTION_KEYWORDS.items():
+        if any(keyword in heading for keyword in keywords):
+            return kind
+    return None
+
+
+def condense_resume(resume_text: str, profile: RoleProfile,
+                    token_budget: int = RESUME_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Shrink a resume for the prompt. Repeated lines (page headers/footers),
+    boilerplate and OCR garbage are always removed, except one-letter lines
+    naming a role skill (profile.short_skills); if the rest exceeds
+    token_budget, sections are kept by relevance to the role profile (section
+    kind plus skill hits) and emitted in their original order.
+    Returns (condensed_text, stats) with token counts before and after.
+    """
+    lines = []
+    seen = set()
+    for raw_line in resume_text.splitlines():
+        line = ' '.join(raw_line.split())
+        if not line or (line.lower() not in profile.short_skills and _is_noise_line(line)):
+            continue
+        key = line.lower()
+        if len(key) >= 15:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
     
-    prompt = f"""You are an objective resume analyzer. Analyze this resume strictly based on the SPECIFIC SKILLS required.
+    # Bagian pertama (sebelum judul bagian apa pun) berisi nama & kontak: selalu dipertahankan
+    sections = [{'kind': 'contact', 'lines': []}]
+    for line in lines:
+        kind = _section_kind(line)
+        if kind is not None:
+            sections.append({'kind': kind, 'lines': []})
+        sections[-1]['lines'].append(line)
+    
+    for section in sections:
+        section['text'] = '\n'.join(section['lines'])
+        section['tokens'] = estimate_tokens(section['text']) + 1
+        skill_hits = len(profile.matcher.find(section['text'].lower()))
+        section['score'] = RESUME_SECTION_SCORES[section['kind']] + 2 * skill_hits
+    
+    condensed_text = '\n'.join(lines)
+    truncated = estimate_tokens(condensed_text) > token_budget
+    if truncated:
+        remaining = token_budget
+        kept = {}
+        ranked = sorted(range(len(sections)), key=lambda idx: (-sections[idx]['score'], idx))
+        for idx in ranked:
+            section = sections[idx]
+            if section['tokens'] <= remaining:
+                kept[idx] = section['lines']
+                remaining -= section['tokens']
+                continue
+            partial = []
+            for line in section['lines']:
+                cost = estimate_tokens(line) + 1
+                if cost > remaining:
+                    break
+                partial.append(line)
+                remaining -= cost
+            if partial:
+                kept[idx] = partial
+        condensed_text = '\n'.join(line for idx in sorted(kept) for line in kept[idx])
+    
+    original_tokens = estimate_tokens(resume_text)
+    condensed_tokens = estimate_tokens(condensed_text)
+    return condensed_text, {
+        'original_tokens': original_tokens,
+        'condensed_tokens': condensed_tokens,
+        'tokens_saved': original_tokens - condensed_tokens,
+        'truncated': truncated,
+    }
 
-RESUME HASH: {resume_hash} (for consistency tracking)
 
-ROLE REQUIREMENTS:
-{requirements}
+LLM_BACKOFF_BASE = 2.0  # detik; backoff eksponensial dengan jitter
+LLM_BACKOFF_MAX = 60.0
+# Batas panggilan Gemini yang berjalan bersamaan di seluruh proses (semua sesi & event loop)
+_LLM_IN_FLIGHT = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_RETRY_AFTER_PATTERN = re.compile(r'retry(?:[ _-]?after|[ _-]?delay| in)\D{0,20}?(\d+(?:\.\d+)?)', re.IGNORECASE)
 
-EXTRACTED REQUIRED SKILLS ({len(required_skills_list)} total):
-{', '.join(required_skills_list[:30])}
 
-RESUME TEXT:
-{resume_text}
-
-BASELINE ANALYSIS (Use this as reference - already calculated from actual skill requirements):
-- Calculated Score: {baseline_score}%
-- Total Required Skills: {baseline_analysis['total_required_skills']}
-- Matched Skills: {baseline_analysis['total_matched_skills']}
-- Skill Match %: {baseline_analysis['skill_match_percentage']}%
-- Education Match: {baseline_analysis['education_match']}
-- Experience: {baseline_analysis['years_of_experience']} years
-- Certifications: {baseline_analysis['has_certifications']}
-
-EVALUATION CRITERIA (Apply strictly based on ACTUAL skills from requirements):
-1. Skills Match (50%): Match specific skills from requirements list above
-2. Education (20%): Does education meet requirements?
-3. Experience (20%): Years of relevant experience
-4. Certifications (10%): Relevant certifications
+# Mode batch: beberapa resume pendek untuk role yang sama dianalisa dalam satu request
+LLM_BATCH_MAX_RESUMES = 5
+LLM_BATCH_MAX_RESUME_TOKENS = 1500
 
-CRITICAL: WORK EXPERIENCE CALCULATION RULES
+ANALYSIS_EXPERIENCE_RULES = """CRITICAL: WORK EXPERIENCE CALCULATION RULES
 When calculating work experience, you MUST:
 1. Carefully identify ALL work experience entries in the resume
 2. For EACH work experience entry, extract:
@@ -936,133 +2078,563 @@ EXAMPLE OF CORRECT CALCULATION:
 - Position 2: Developer at Company B (Jan 2022 - Present/Oct 2024) = 2.8 years
 - TOTAL EXPERIENCE: 2 + 2.8 = 4.8 years (round down to 4 years or up to 5 years)
 
-DO NOT underestimate experience - if you see multiple work experiences, calculate them ALL carefully!
+DO NOT underestimate experience - if you see multiple work experiences, calculate them ALL carefully!"""
+
+ANALYSIS_EVALUATION_CRITERIA = """EVALUATION CRITERIA (Apply strictly based on ACTUAL skills from requirements):
+1. Skills Match (50%): Match specific skills from requirements list above
+2. Education (20%): Does education meet requirements?
+3. Experience (20%): Years of relevant experience
+4. Certifications (10%): Relevant certifications"""
+
+# Mode triase: CV dengan skor baseline jauh dari batas lolos (70%) diputuskan
+# tanpa Gemini; hanya CV di sekitar batas yang dianalisa AI.
+TRIAGE_DEFAULT_MARGIN = 25
+TRIAGE_MARGIN_RANGE = (10, 50)
+_PHONE_PATTERN = re.compile(r'(?<![\d+])\+?\d[\d\s().-]{7,18}\d(?!\d)')
+_NAME_LABEL_PATTERN = re.compile(r'^\s*(?:nama(?: lengkap)?|full name|name)\s*[:\-]\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+_NAME_LINE_PATTERN = re.compile(r"^[A-Za-z][A-Za-z.'\-]*(?:\s+[A-Za-z][A-Za-z.'\-]*){1,4}$")
+_NOT_A_NAME_WORDS = {'curriculum', 'vitae', 'resume', 'cv', 'profile', 'profil', 'summary', 'contact', 'kontak', 'data', 'pribadi', 'personal'}
+# Baris tanpa label "Nama:" yang memuat kata jabatan (atau kata dari requirements role)
+# adalah judul seperti "Software Engineer", bukan nama kandidat
+_JOB_TITLE_WORDS = {
+    'engineer', 'developer', 'programmer', 'manager', 'analyst', 'consultant', 'specialist',
+    'officer', 'staff', 'admin', 'administrator', 'assistant', 'asisten', 'intern', 'designer',
+    'architect', 'scientist', 'lead', 'senior', 'junior', 'head', 'director', 'supervisor',
+    'coordinator', 'koordinator', 'executive', 'accountant', 'akuntan', 'technician', 'teknisi',
+    'operator', 'marketing', 'sales', 'software', 'teacher', 'guru', 'nurse', 'perawat', 'driver',
+    'karyawan', 'pegawai', 'fresh', 'graduate', 'lulusan', 'mahasiswa', 'student',
+}
+
+
+def triage_margin_setting() -> Optional[int]:
+    """Margin around the 70% threshold when triage mode is on, otherwise None."""
+    if not st.session_state.get('triage_mode', False):
+        return None
+    return int(st.session_state.get('triage_margin', TRIAGE_DEFAULT_MARGIN))
+
+
+def guess_candidate_name(resume_text: str, requirements: str = '') -> str:
+    """
+    Candidate name from a 'Name:' label, or else the first name-like line that is
+    not a section heading and has no job-title or requirements words; 'N/A' otherwise.
+    """
+    labelled = _NAME_LABEL_PATTERN.search(resume_text)
+    candidates = [(labelled.group(1), _NOT_A_NAME_WORDS)] if labelled else []
+    title_words = _NOT_A_NAME_WORDS | _JOB_TITLE_WORDS | set(re.findall(r'[a-z]{3,}', requirements.lower()))
+    candidates += [(line, title_words) for line in resume_text.splitlines()[:8]]
+    
+    for line, rejected_words in candidates:
+        line = ' '.join(line.split())
+        if not _NAME_LINE_PATTERN.match(line):
+            continue
+        if any(word.lower().strip('.') in rejected_words for word in line.split()):
+            continue
+        if rejected_words is title_words and _section_kind(line) is not None:
+            continue
+        return line.title() if line.isupper() else line
+    return 'N/A'
+
+
+def guess_candidate_phone(resume_text: str) -> str:
+    """First phone-like number in the resume (9-15 digits), or 'N/A'."""
+    for match in _PHONE_PATTERN.finditer(resume_text):
+        number = match.group(0).strip()
+        digits = re.sub(r'\D', '', number)
+        # Rentang tahun seperti "2019 - 2023" bukan nomor telepon
+        if 9 <= len(digits) <= 15 and not re.fullmatch(r'(?:19|20)\d{2}\D+(?:19|20)\d{2}', number):
+            return number
+    return 'N/A'
+
+
+def triage_analysis_result(resume_text: str, requirements: str, baseline_analysis: Dict,
+                           feedback_lang: str, margin: int) -> Dict:
+    """Templated analysis result for a CV decided from its baseline score alone."""
+    score = baseline_analysis['score']
+    selected = score >= 70
+    years = baseline_analysis['years_of_experience']
+    matching = baseline_analysis['matching_skills']
+    missing = baseline_analysis['missing_skills']
+    matched_count = f"{baseline_analysis['total_matched_skills']}/{baseline_analysis['total_required_skills']}"
+    
+    if feedback_lang == "Bahasa Indonesia":
+        feedback = (
+            f"Keputusan otomatis berdasarkan skor baseline {score}% (batas lolos 70%, di luar rentang peninjauan ±{margin}%), "
+            f"tanpa analisa AI. Skill yang cocok ({matched_count}): {', '.join(matching) or '-'}. "
+            f"Skill yang tidak ditemukan: {', '.join(missing) or '-'}. "
+            f"Pendidikan {'sesuai' if baseline_analysis['education_match'] else 'tidak terdeteksi sesuai'}, "
+            f"pengalaman kerja sekitar {years} tahun, sertifikasi {'ada' if baseline_analysis['has_certifications'] else 'tidak terdeteksi'}. "
+            + ("Kandidat direkomendasikan untuk tahap berikutnya." if selected else "Kandidat belum memenuhi persyaratan posisi.")
+        )
+    else:
+        feedback = (
+            f"Automatic decision from the baseline score of {score}% (pass mark 70%, outside the review band of ±{margin}%), "
+            f"without AI analysis. Matching skills ({matched_count}): {', '.join(matching) or '-'}. "
+            f"Skills not found: {', '.join(missing) or '-'}. "
+            f"Education {'matches' if baseline_analysis['education_match'] else 'not detected as matching'}, "
+            f"about {years} years of work experience, certifications {'present' if baseline_analysis['has_certifications'] else 'not detected'}. "
+            + ("The candidate is recommended for the next stage." if selected else "The candidate does not yet meet the role requirements.")
+        )
+    
+    return {
+        "candidate_name": guess_candidate_name(resume_text, requirements),
+        "candidate_phone": guess_candidate_phone(resume_text),
+        "selected": selected,
+        "feedback": feedback,
+        "matching_skills": matching,
+        "missing_skills": missing,
+        "experience_level": "senior" if years >= 5 else "mid" if years >= 2 else "junior",
+        "match_percentage": score,
+        "triaged": True,
+    }
+
+
+# Prefix prompt statis per role (requirements + instruksi) disimpan di proses;
+# hanya bagian per-resume yang dibangun ulang untuk setiap CV.
+ROLE_PROMPT_CACHE_SIZE = 32
+_ROLE_PROMPT_PREFIXES: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_ROLE_PROMPT_PREFIXES_LOCK = threading.Lock()
+
+def role_prompt_prefix(requirements: str, required_skills: List[str], feedback_lang: str) -> str:
+    """
+    The part of the analysis prompt that is identical for every resume of a role,
+    built once per (requirements, feedback language) and reused from memory.
+    """
+    key = (requirements_hash(requirements), feedback_lang)
+    with _ROLE_PROMPT_PREFIXES_LOCK:
+        prefix = _ROLE_PROMPT_PREFIXES.get(key)
+        if prefix is not None:
+            _ROLE_PROMPT_PREFIXES.move_to_end(key)
+            return prefix
+    
+    prefix = f"""You are an objective resume analyzer. Analyze the resume given after these instructions strictly based on the SPECIFIC SKILLS required.
+
+ROLE REQUIREMENTS:
+{requirements}
+
+EXTRACTED REQUIRED SKILLS ({len(required_skills)} total):
+{', '.join(required_skills[:30])}
+
+{ANALYSIS_EVALUATION_CRITERIA}
+
+{ANALYSIS_EXPERIENCE_RULES}
+
+SCORING RULES (Be consistent and deterministic):
+- Score MUST be based on skill matching percentage from requirements
+- If score >= 70: selected = true
+- If score < 70: selected = false
+- The BASELINE score given with the resume is already calculated from actual skill requirements
+- Match percentage MUST reflect actual skills matched vs required
+
+OUTPUT REQUIREMENTS:
+- Return ONLY a valid JSON object
+- No markdown formatting, no code blocks, no extra text
+- Feedback must be in {feedback_lang}
+- Be professional, specific, and data-driven
+- List SPECIFIC skills that match and are missing
+
+CRITICAL: SKILLS CLASSIFICATION RULES
+- A skill can ONLY be in matching_skills OR missing_skills, NEVER in both
+- If a skill is found in the resume, it goes to matching_skills
+- If a skill is NOT found in the resume, it goes to missing_skills
+- No overlap is allowed between the two lists
+- Use the BASELINE MATCHING SKILLS and BASELINE MISSING SKILLS given with the resume as reference
+- Only adjust if you find clear evidence in the resume that changes the classification
+
+Required JSON structure:
+{{
+    "candidate_name": "Full Name from Resume or 'N/A'",
+    "candidate_phone": "Phone Number or 'N/A'",
+    "selected": true or false,
+    "feedback": "Professional evaluation in {feedback_lang} (minimum 100 words, be specific about which skills matched/missing)",
+    "matching_skills": ["BASELINE MATCHING SKILLS, adjusted only on clear evidence"],
+    "missing_skills": ["BASELINE MISSING SKILLS, adjusted only on clear evidence"],
+    "experience_level": "junior or mid or senior",
+    "match_percentage": 0-100
+}}
+
+IMPORTANT: 
+- match_percentage starts from the BASELINE score, which is ALREADY calculated based on actual skill requirements
+- Only adjust if you find additional information not captured in baseline analysis
+- The baseline skill lists are provided from skill requirements analysis
+- Be consistent across all resumes"""
+    
+    with _ROLE_PROMPT_PREFIXES_LOCK:
+        _ROLE_PROMPT_PREFIXES[key] = prefix
+        while len(_ROLE_PROMPT_PREFIXES) > ROLE_PROMPT_CACHE_SIZE:
+            _ROLE_PROMPT_PREFIXES.popitem(last=False)
+    return prefix
+
+
+@dataclass
+class AnalysisRequest:
+    """A prepared resume analysis: the prompt plus what is needed to check the reply."""
+    resume_hash: str
+    cache_key: str = ''
+    prompt: str = ''
+    baseline_score: int = 0
+    matching_skills: List[str] = field(default_factory=list)
+    missing_skills: List[str] = field(default_factory=list)
+    condensation: Dict = field(default_factory=dict)
+    requirements: str = ''
+    required_skills: List[str] = field(default_factory=list)
+    feedback_lang: str = ''
+    resume_block: str = ''  # bagian per-resume untuk prompt batch
+    prompt_prefix: str = ''  # bagian statis per role (lihat role_prompt_prefix)
+    prompt_suffix: str = ''  # bagian per-resume
+    outcome: Optional[Tuple[bool, str, Dict]] = None  # set when no AI call is needed
+
+
+def prepare_resume_analysis(resume_text: str, role: str, force_reanalyze: bool = False) -> AnalysisRequest:
+    """
+    Build the prompt for a resume, or the final outcome directly when the role
+    is unknown or the analysis is cached.
+    """
+    resume_hash = hashlib.md5(resume_text.encode()).hexdigest()[:8]
+    
+    roles = load_roles()
+    requirements = roles.get(role, "")
+    
+    if not requirements:
+        return AnalysisRequest(resume_hash, outcome=(False, f"Role '{role}' not found in system", {}))
+    
+    lang = st.session_state.get('language', 'id')
+    feedback_lang = "Bahasa Indonesia" if lang == 'id' else "English"
+    
+    cache_key = analysis_cache_key(resume_text, requirements, feedback_lang)
+    if not force_reanalyze:
+        cached = ANALYSIS_CACHE.get(cache_key)
+        if cached is not None:
+            result = json.loads(cached[0])
+            logger.info(f"Using cached analysis: {result.get('candidate_name')} ({result.get('match_percentage')}%)")
+            return AnalysisRequest(resume_hash, outcome=(result["selected"], result["feedback"], result))
+    
+    # Calculate baseline score with IMPROVED skill matching
+    resume_doc = ResumeDocument(resume_text)
+    baseline_analysis = calculate_consistent_score(resume_doc, requirements)
+    baseline_score = baseline_analysis['score']
+    
+    # Triase: skor jauh di atas/bawah batas tidak akan berubah keputusannya oleh AI.
+    # Hasilnya tidak disimpan di ANALYSIS_CACHE agar mode non-triase tetap memanggil AI.
+    triage_margin = triage_margin_setting()
+    if triage_margin is not None and abs(baseline_score - 70) >= triage_margin:
+        result = triage_analysis_result(resume_text, requirements, baseline_analysis, feedback_lang, triage_margin)
+        logger.info(f"Triaged without AI: {result['candidate_name']} ({baseline_score}%)")
+        return AnalysisRequest(resume_hash, outcome=(result["selected"], result["feedback"], result))
+    
+    # Get the actual skills for accurate matching
+    required_skills_list = baseline_analysis['required_skills']
+    matching_skills_list = baseline_analysis['matching_skills']
+    missing_skills_list = baseline_analysis['missing_skills']
+    
+    # Hanya teks yang relevan yang dikirim ke AI; skor baseline tetap dari teks lengkap
+    prompt_resume_text, condensation = condense_resume(resume_text, get_role_profile(requirements))
+    if condensation['tokens_saved'] > 0:
+        logger.info(f"Resume condensed from {condensation['original_tokens']} to {condensation['condensed_tokens']} tokens")
+    
+    resume_block = f"""RESUME HASH: {resume_hash}
+BASELINE: score {baseline_score}%, skills matched {baseline_analysis['total_matched_skills']}/{baseline_analysis['total_required_skills']} ({baseline_analysis['skill_match_percentage']}%), education match {baseline_analysis['education_match']}, experience {baseline_analysis['years_of_experience']} years, certifications {baseline_analysis['has_certifications']}
+BASELINE MATCHING SKILLS: {matching_skills_list}
+BASELINE MISSING SKILLS: {missing_skills_list}
+RESUME TEXT:
+{prompt_resume_text}"""
+    
+    prompt_prefix = role_prompt_prefix(requirements, required_skills_list, feedback_lang)
+    prompt_suffix = f"{resume_block}\n\nAnalyze now and return ONLY the JSON:"
+
+    return AnalysisRequest(
+        resume_hash=resume_hash,
+        cache_key=cache_key,
+        prompt=f"{prompt_prefix}\n\n{prompt_suffix}",
+        baseline_score=baseline_score,
+        matching_skills=matching_skills_list,
+        missing_skills=missing_skills_list,
+        condensation=condensation,
+        requirements=requirements,
+        required_skills=required_skills_list,
+        feedback_lang=feedback_lang,
+        resume_block=resume_block,
+        prompt_prefix=prompt_prefix,
+        prompt_suffix=prompt_suffix,
+    )
+
+
+def response_message(response) -> Optional[str]:
+    """Text content of a phi agent response."""
+    # FIXED: Improved response handling for Gemini
+    msg = None
+    if hasattr(response, 'content') and response.content:
+        msg = response.content
+    elif hasattr(response, 'messages') and response.messages:
+        for m in response.messages:
+            if hasattr(m, 'role') and m.role == 'assistant':
+                if hasattr(m, 'content') and m.content:
+                    msg = m.content
+                    break
+            # Fallback: try to get content directly if role not set
+            elif hasattr(m, 'content') and m.content:
+                msg = m.content
+                break
+    return msg
+
+
+def finish_resume_analysis(request: AnalysisRequest, msg: Optional[str]) -> Tuple[bool, str, Dict]:
+    """Validate and normalize the AI reply for a request; raises ValueError on a bad reply."""
+    if not msg:
+        raise ValueError("No response content from AI. Please check your API key and try again.")
+    
+    return normalize_analysis_result(request, extract_json_from_response(msg))
+
+
+def normalize_analysis_result(request: AnalysisRequest, result: Dict) -> Tuple[bool, str, Dict]:
+    """Apply the baseline and status rules to a parsed AI result and cache it."""
+    if not isinstance(result, dict) or not validate_analysis_result(result):
+        raise ValueError("Invalid result structure")
+    
+    # Ensure match_percentage is set and reasonable
+    if "match_percentage" not in result:
+        result["match_percentage"] = request.baseline_score
+    else:
+        result["match_percentage"] = max(0, min(100, int(result["match_percentage"])))
+    
+    # Use baseline skills if AI didn't provide them
+    if "matching_skills" not in result or not result["matching_skills"]:
+        result["matching_skills"] = request.matching_skills
+    if "missing_skills" not in result or not result["missing_skills"]:
+        result["missing_skills"] = request.missing_skills
+    
+    # CRITICAL: Remove any overlap between matching and missing skills
+    # A skill cannot be both matching AND missing at the same time
+    matching_set = set([s.lower().strip() for s in result["matching_skills"]])
+    missing_set = set([s.lower().strip() for s in result["missing_skills"]])
+    
+    # Find and remove overlaps
+    overlap = matching_set.intersection(missing_set)
+    if overlap:
+        logger.warning(f"Found skill overlap, removing from missing_skills: {overlap}")
+        # Keep in matching_skills, remove from missing_skills
+        result["missing_skills"] = [s for s in result["missing_skills"] 
+                                   if s.lower().strip() not in overlap]
+    
+    # CRITICAL FIX: Determine selection STRICTLY based on match percentage
+    # This ensures consistent status regardless of AI response
+    final_match_percentage = result["match_percentage"]
+    if final_match_percentage >= 70:
+        result["selected"] = True
+        selected_status = True
+    else:
+        result["selected"] = False
+        selected_status = False
+    
+    result["resume_condensation"] = request.condensation
+    
+    logger.info(f"Analysis successful: {result['candidate_name']} - {'SELECTED' if selected_status else 'REJECTED'} ({final_match_percentage}%)")
+    
+    try:
+        ANALYSIS_CACHE.put(request.cache_key, json.dumps(result).encode())
+    except (OSError, TypeError) as e:
+        logger.warning(f"Could not cache analysis result: {e}")
+    
+    return selected_status, result["feedback"], result
+
+
+def _run_analyzer(analyzer: Agent, prompt: str):
+    """Blocking Gemini call under the global in-flight limit and the rate limiter."""
+    with _LLM_IN_FLIGHT:
+        LLM_RATE_LIMITER.acquire()
+        return run_gemini_agent(analyzer, prompt)
+
+
+def _run_prepared_request(analyzer: Agent, request: AnalysisRequest):
+    """Send a prepared request through the agent."""
+    return _run_analyzer(analyzer, request.prompt)
+
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """
+    Seconds to wait before retry number attempt + 1: the provider's retry-after
+    hint when the error carries one, otherwise exponential backoff with jitter.
+    """
+    hint = getattr(error, 'retry_after', None)
+    if hint is None:
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        hint = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if hint is None:
+        match = _RETRY_AFTER_PATTERN.search(str(error))
+        hint = match.group(1) if match else None
+    try:
+        if hint is not None:
+            return min(LLM_BACKOFF_MAX, float(hint)) + random.uniform(0, 1)
+    except (TypeError, ValueError):
+        pass
+    backoff = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+async def analyze_resume_async(
+    resume_text: str,
+    role: str,
+    analyzer: Agent,
+    max_retries: int = 3,
+    force_reanalyze: bool = False
+) -> Tuple[bool, str, Dict]:
+    """
+    Analyze resume with enhanced consistency, accuracy, and skill-based matching.
+    CORE IMPROVEMENTS: Uses actual skills from requirements for accurate percentage calculation.
+    Earlier results for the same resume, requirements, model and language are reused
+    from ANALYSIS_CACHE unless force_reanalyze is set. The blocking Gemini call runs
+    in a thread, so many analyses can be awaited together; at most LLM_MAX_CONCURRENCY
+    are in flight process-wide and retries back off with jitter.
+    """
+    request = prepare_resume_analysis(resume_text, role, force_reanalyze)
+    if request.outcome is not None:
+        return request.outcome
+    return await run_resume_analysis_async(request, analyzer, max_retries)
+
+
+async def run_resume_analysis_async(request: AnalysisRequest, analyzer: Agent,
+                                    max_retries: int = 3) -> Tuple[bool, str, Dict]:
+    """Send one prepared request to the AI, retrying with backoff."""
+    last_error = None
+    
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"Analysis attempt {attempt + 1}/{max_retries} for resume hash {request.resume_hash}")
+            
+            response = await asyncio.to_thread(_run_prepared_request, analyzer, request)
+            msg = response_message(response)
+            if not msg:
+                logger.error(f"No content in response. Response type: {type(response)}, Response: {response}")
+            return finish_resume_analysis(request, msg)
+            
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
+            
+            if attempt < max_retries - 1:
+                wait_time = retry_delay(attempt, e)
+                logger.info(f"Waiting {wait_time:.1f}s before retry...")
+                await asyncio.sleep(wait_time)
+    
+    error_msg = f"{get_text('error_processing')}: {str(last_error)}"
+    logger.error(f"All analysis attempts failed: {last_error}")
+    return False, error_msg, {}
+
+
+def build_batch_prompt(analysis_requests: List[AnalysisRequest]) -> str:
+    """One prompt for several prepared resumes of the same role, answered as a JSON array."""
+    first = analysis_requests[0]
+    resume_blocks = "\n\n".join(
+        f"=== RESUME {number} ===\n{request.resume_block}" for number, request in enumerate(analysis_requests, 1)
+    )
+    return f"""You are an objective resume analyzer. Analyze EACH of the {len(analysis_requests)} resumes below independently, strictly based on the SPECIFIC SKILLS required for the same role.
+
+ROLE REQUIREMENTS:
+{first.requirements}
+
+EXTRACTED REQUIRED SKILLS ({len(first.required_skills)} total):
+{', '.join(first.required_skills[:30])}
+
+{ANALYSIS_EVALUATION_CRITERIA}
+
+{ANALYSIS_EXPERIENCE_RULES}
 
 SCORING RULES (Be consistent and deterministic):
-- Score MUST be based on skill matching percentage from requirements
-- If score >= 70: selected = true
-- If score < 70: selected = false
-- The baseline score of {baseline_score}% is already calculated from actual skill requirements
-- Match percentage MUST reflect actual skills matched vs required
+- Start from each resume's BASELINE score, already calculated from actual skill requirements
+- Only adjust a baseline if you find clear evidence in that resume
+- If score >= 70: selected = true, otherwise selected = false
+- Never let one resume influence the evaluation of another
 
 OUTPUT REQUIREMENTS:
-- Return ONLY a valid JSON object
+- Return ONLY a valid JSON array with exactly one object per resume
 - No markdown formatting, no code blocks, no extra text
-- Feedback must be in {feedback_lang}
-- Be professional, specific, and data-driven
-- List SPECIFIC skills that match and are missing
-
-CRITICAL: SKILLS CLASSIFICATION RULES
-- A skill can ONLY be in matching_skills OR missing_skills, NEVER in both
-- If a skill is found in the resume, it goes to matching_skills
-- If a skill is NOT found in the resume, it goes to missing_skills
-- No overlap is allowed between the two lists
-- Use the provided lists {matching_skills_list} and {missing_skills_list} as reference
-- Only adjust if you find clear evidence in the resume that changes the classification
+- Every object MUST contain the "resume_hash" of its resume exactly as given
+- Feedback must be in {first.feedback_lang} (minimum 100 words, be specific about which skills matched/missing)
+- A skill can ONLY be in matching_skills OR missing_skills, NEVER in both; use the BASELINE lists as reference
 
-Required JSON structure:
+Required structure of each object:
 {{
+    "resume_hash": "RESUME HASH as given",
     "candidate_name": "Full Name from Resume or 'N/A'",
     "candidate_phone": "Phone Number or 'N/A'",
     "selected": true or false,
-    "feedback": "Professional evaluation in {feedback_lang} (minimum 100 words, be specific about which skills matched/missing)",
-    "matching_skills": {matching_skills_list},
-    "missing_skills": {missing_skills_list},
+    "feedback": "Professional evaluation in {first.feedback_lang}",
+    "matching_skills": ["..."],
+    "missing_skills": ["..."],
     "experience_level": "junior or mid or senior",
-    "match_percentage": {baseline_score}
+    "match_percentage": 0-100
 }}
 
-IMPORTANT: 
-- The match_percentage ({baseline_score}%) is ALREADY calculated based on actual skill requirements
-- Only adjust if you find additional information not captured in baseline analysis
-- The matching_skills and missing_skills lists are provided from skill requirements analysis
-- Be consistent across all resumes
+{resume_blocks}
 
-Analyze now and return ONLY the JSON:"""
+Analyze now and return ONLY the JSON array:"""
 
-    last_error = None
+
+def extract_json_array_from_response(response: str) -> list:
+    """Extract a JSON array from an AI response, handling markdown code blocks."""
+    response = response.strip()
+    if response.startswith('```'):
+        response = re.sub(r'^```(?:json)?\s*\n', '', response)
+        response = re.sub(r'\n```\s*$', '', response)
     
-    for attempt in range(max_retries):
+    json_match = re.search(r'\[[\s\S]*\]', response)
+    if json_match:
+        response = json_match.group(0)
+    
+    try:
+        items = json.loads(response)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON array in AI response: {str(e)}")
+    if not isinstance(items, list):
+        raise ValueError("AI response is not a JSON array")
+    return items
+
+
+async def analyze_resume_batch_async(analysis_requests: List[AnalysisRequest], analyzer: Agent,
+                                     max_retries: int = 3) -> List[Tuple[bool, str, Dict]]:
+    """
+    Analyze prepared requests of one role with a single batched prompt.
+    Each returned item is validated on its own; items that are missing or
+    invalid (or all of them, if the batch call fails) are retried individually.
+    """
+    unique_requests = list({request.resume_hash: request for request in analysis_requests if request.outcome is None}.values())
+    outcomes: Dict[str, Tuple[bool, str, Dict]] = {}
+    
+    if len(unique_requests) > 1:
         try:
-            logger.info(f"Analysis attempt {attempt + 1}/{max_retries} for resume hash {resume_hash}")
-            
-            response = analyzer.run(prompt)
-            
-            # FIXED: Improved response handling for Gemini
-            msg = None
-            if hasattr(response, 'content') and response.content:
-                msg = response.content
-            elif hasattr(response, 'messages') and response.messages:
-                for m in response.messages:
-                    if hasattr(m, 'role') and m.role == 'assistant':
-                        if hasattr(m, 'content') and m.content:
-                            msg = m.content
-                            break
-                    # Fallback: try to get content directly if role not set
-                    elif hasattr(m, 'content') and m.content:
-                        msg = m.content
-                        break
-            
-            if not msg:
-                logger.error(f"No content in response. Response type: {type(response)}, Response: {response}")
-                raise ValueError("No response content from AI. Please check your API key and try again.")
-            
-            result = extract_json_from_response(msg)
-            
-            if not validate_analysis_result(result):
-                raise ValueError("Invalid result structure")
-            
-            # Ensure match_percentage is set and reasonable
-            if "match_percentage" not in result:
-                result["match_percentage"] = baseline_score
-            else:
-                result["match_percentage"] = max(0, min(100, int(result["match_percentage"])))
-            
-            # Use baseline skills if AI didn't provide them
-            if "matching_skills" not in result or not result["matching_skills"]:
-                result["matching_skills"] = matching_skills_list
-            if "missing_skills" not in result or not result["missing_skills"]:
-                result["missing_skills"] = missing_skills_list
-            
-            # CRITICAL: Remove any overlap between matching and missing skills
-            # A skill cannot be both matching AND missing at the same time
-            matching_set = set([s.lower().strip() for s in result["matching_skills"]])
-            missing_set = set([s.lower().strip() for s in result["missing_skills"]])
-            
-            # Find and remove overlaps
-            overlap = matching_set.intersection(missing_set)
-            if overlap:
-                logger.warning(f"Found skill overlap, removing from missing_skills: {overlap}")
-                # Keep in matching_skills, remove from missing_skills
-                result["missing_skills"] = [s for s in result["missing_skills"] 
-                                           if s.lower().strip() not in overlap]
-            
-            # CRITICAL FIX: Determine selection STRICTLY based on match percentage
-            # This ensures consistent status regardless of AI response
-            final_match_percentage = result["match_percentage"]
-            if final_match_percentage >= 70:
-                result["selected"] = True
-                selected_status = True
-            else:
-                result["selected"] = False
-                selected_status = False
-            
-            logger.info(f"Analysis successful: {result['candidate_name']} - {'SELECTED' if selected_status else 'REJECTED'} ({final_match_percentage}%)")
-            
-            return selected_status, result["feedback"], result
-            
+            logger.info(f"Batched analysis of {len(unique_requests)} resumes")
+            response = await asyncio.to_thread(_run_analyzer, analyzer, build_batch_prompt(unique_requests))
+            items = extract_json_array_from_response(response_message(response) or '')
+            items_by_hash = {str(item.get('resume_hash')): item for item in items if isinstance(item, dict)}
+            for request in unique_requests:
+                item = items_by_hash.get(request.resume_hash)
+                if item is None:
+                    continue
+                try:
+                    outcomes[request.resume_hash] = normalize_analysis_result(
+                        request, {key: value for key, value in item.items() if key != 'resume_hash'}
+                    )
+                except Exception as e:
+                    logger.warning(f"Invalid batched result for resume hash {request.resume_hash}: {e}")
         except Exception as e:
-            last_error = e
-            logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
-            
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 2
-                logger.info(f"Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
+            logger.warning(f"Batched analysis failed: {e}")
     
-    error_msg = f"{get_text('error_processing')}: {str(last_error)}"
-    logger.error(f"All analysis attempts failed: {last_error}")
-    return False, error_msg, {}
+    for request in unique_requests:
+        if request.resume_hash not in outcomes:
+            outcomes[request.resume_hash] = await run_resume_analysis_async(request, analyzer, max_retries)
+    
+    return [request.outcome if request.outcome is not None else outcomes[request.resume_hash]
+            for request in analysis_requests]
+
+
+def analyze_resume(
+    resume_text: str,
+    role: str,
+    analyzer: Agent,
+    max_retries: int = 3,
+    force_reanalyze: bool = False
+) -> Tuple[bool, str, Dict]:
+    """Blocking wrapper around analyze_resume_async for callers outside an event loop."""
+    return asyncio.run(analyze_resume_async(resume_text, role, analyzer, max_retries, force_reanalyze))
 
 
 # --- 7. FUNGSI URL VALIDATION & DOWNLOAD (IMPROVED) ---
@@ -1121,10 +2693,71 @@ def is_google_auth_error(content: bytes) -> bool:
     
     return any(pattern in content_start for pattern in auth_patterns)
 
+DOWNLOAD_CACHE = DiskCache('downloads', max_bytes=500_000_000)
+# Entri cache dipakai tanpa request selama jendela ini; setelahnya divalidasi
+# ulang dengan ETag/Last-Modified (304), atau di-download ulang bila tidak ada.
+DOWNLOAD_CACHE_FRESH_SECONDS = 600
+DOWNLOAD_MAX_BYTES = 20_000_000  # 20 MB; CV lebih besar dihentikan di tengah download
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_SNIFF_BYTES = 2048  # cukup untuk cek %PDF / halaman login Google
+
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared requests.Session for CV downloads: keep-alive connection pool sized for
+    the download workers and a bounded retry on connection errors / 429 / 5xx.
+    """
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+
+def normalize_cv_url(url: str) -> str:
+    """Canonical form of a (Drive-converted) CV link, used as the download cache key."""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+def _reject_downloaded_head(head: bytes, candidate_name: str) -> bool:
+    """Check the first bytes of a download; True if it is a login/HTML page, not a CV."""
+    # Check if we got a Google authentication page
+    if is_google_auth_error(head):
+        logger.error(f"Google Drive authentication required for {candidate_name}")
+        return True
+    
+    # Check if content is likely PDF
+    if not head.startswith(b'%PDF'):
+        if head.lstrip()[:15].lower().startswith((b'<!doctype', b'<html')):
+            logger.error(f"Downloaded HTML instead of PDF - likely authentication or access issue")
+            return True
+    return False
+
+
 def download_cv_from_url(url: str, candidate_name: str = "unknown", timeout: int = 45) -> Optional[BytesIO]:
     """
     Download CV from URL with improved timeout and error handling.
     IMPROVEMENT: Increased timeout to 45 seconds and better error recovery.
+    Uses the shared pooled session and streams the body in chunks: login/HTML pages
+    are rejected after the first few KB and bodies over DOWNLOAD_MAX_BYTES are cut off.
+    Downloads are cached on disk by normalized URL and revalidated with ETag/Last-Modified.
     """
     try:
         safe_name = re.sub(r'[^\w\s-]', '', candidate_name).strip().replace(' ', '_')
@@ -1135,37 +2768,70 @@ def download_cv_from_url(url: str, candidate_name: str = "unknown", timeout: int
         if url != original_url:
             logger.info(f"Using converted Google Drive link for {candidate_name}")
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        cache_key = normalize_cv_url(url)
+        cached = DOWNLOAD_CACHE.get(cache_key)
+        headers = {}
+        if cached is not None:
+            cached_content, cached_meta = cached
+            if time.time() - cached_meta.get('validated_at', 0) < DOWNLOAD_CACHE_FRESH_SECONDS:
+                logger.info(f"Using cached CV for {candidate_name} ({len(cached_content)} bytes)")
+                return _cv_bytes_io(cached_content, safe_name)
+            if cached_meta.get('etag'):
+                headers['If-None-Match'] = cached_meta['etag']
+            if cached_meta.get('last_modified'):
+                headers['If-Modified-Since'] = cached_meta['last_modified']
         
         logger.info(f"Downloading CV from: {url}")
         
         # Use increased timeout for better reliability
-        response = requests.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=True)
-        response.raise_for_status()
+        with get_http_session().get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=True) as response:
+            if response.status_code == 304 and cached is not None:
+                logger.info(f"CV not modified, using cached copy for {candidate_name}")
+                DOWNLOAD_CACHE.update_meta(cache_key, validated_at=time.time())
+                return _cv_bytes_io(cached_content, safe_name)
+            response.raise_for_status()
+            
+            content_type = response.headers.get('Content-Type', '')
+            declared_length = response.headers.get('Content-Length', '')
+            if declared_length.isdigit() and int(declared_length) > DOWNLOAD_MAX_BYTES:
+                logger.error(f"CV too large for {candidate_name}: {declared_length} bytes > {DOWNLOAD_MAX_BYTES}")
+                return None
+            
+            chunks = []
+            content_length = 0
+            checked = False
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                chunks.append(chunk)
+                content_length += len(chunk)
+                
+                if not checked and content_length >= DOWNLOAD_SNIFF_BYTES:
+                    checked = True
+                    if _reject_downloaded_head(b''.join(chunks)[:DOWNLOAD_SNIFF_BYTES], candidate_name):
+                        return None
+                
+                if content_length > DOWNLOAD_MAX_BYTES:
+                    logger.error(f"CV too large for {candidate_name}: more than {DOWNLOAD_MAX_BYTES} bytes")
+                    return None
+            
+            validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
         
-        content_type = response.headers.get('Content-Type', '')
-        content_length = len(response.content)
+        content = b''.join(chunks)
         logger.info(f"Downloaded {content_length} bytes, Content-Type: {content_type}")
         
-        # Check if we got a Google authentication page
-        if is_google_auth_error(response.content):
-            logger.error(f"Google Drive authentication required for {candidate_name}")
+        if not checked and _reject_downloaded_head(content[:DOWNLOAD_SNIFF_BYTES], candidate_name):
             return None
         
-        # Check if content is likely PDF
-        if not response.content.startswith(b'%PDF'):
-            if response.content.startswith(b'<!DOCTYPE') or response.content.startswith(b'<html'):
-                logger.error(f"Downloaded HTML instead of PDF - likely authentication or access issue")
-                return None
-        
-        cv_file = BytesIO(response.content)
-        cv_file.name = f"{safe_name}.pdf"
-        cv_file.seek(0)
+        try:
+            DOWNLOAD_CACHE.put(cache_key, content, {**validators, 'validated_at': time.time()})
+        except OSError as e:
+            logger.warning(f"Could not cache CV download for {candidate_name}: {e}")
         
-        logger.info(f"Successfully created BytesIO for {safe_name}.pdf")
-        return cv_file
+        return _cv_bytes_io(content, safe_name)
         
     except requests.exceptions.Timeout:
         logger.error(f"Timeout downloading CV from {url} after {timeout} seconds")
@@ -1177,6 +2843,15 @@ def download_cv_from_url(url: str, candidate_name: str = "unknown", timeout: int
         logger.error(f"Unexpected error downloading CV: {e}")
         return None
 
+
+def _cv_bytes_io(content: bytes, safe_name: str) -> BytesIO:
+    cv_file = BytesIO(content)
+    cv_file.name = f"{safe_name}.pdf"
+    cv_file.seek(0)
+    
+    logger.info(f"Successfully created BytesIO for {safe_name}.pdf")
+    return cv_file
+
 def read_excel_with_cv_links(excel_file) -> Optional[pd.DataFrame]:
     """Read Excel file and extract CV links."""
     try:
@@ -1228,6 +2903,7 @@ def process_excel_cv_links(excel_file, role: str, max_cvs: int = 50) -> List[Dic
     3. Save progress after each CV
     4. Continue on errors instead of stopping
     5. PERBAIKAN: Progress bar selalu dibersihkan dengan try-finally
+    6. Download paralel dengan batas per host, tumpang tindih dengan analisa
     """
     results = []
     progress_bar = None
@@ -1244,91 +2920,28 @@ def process_excel_cv_links(excel_file, role: str, max_cvs: int = 50) -> List[Dic
             st.warning(f"⚠️ File memiliki {len(df)} CV. Akan diproses {max_cvs} CV pertama. / File has {len(df)} CVs. Will process first {max_cvs} CVs.")
             df = df.head(max_cvs)
         
-        total_cvs = len(df)
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        processed_count = 0
-        error_count = 0
-        
-        for idx, row in df.iterrows():
-            cv_link = row['cv_link']
-            candidate_name = row['candidate_name']
-            
-            progress = (idx + 1) / total_cvs
-            progress_bar.progress(progress)
-            status_text.text(f"⏳ {get_text('downloading_cv')} {idx+1}/{total_cvs}: {candidate_name}")
-            
-            result = {
-                'filename': f"{candidate_name}.pdf",
-                'role': role,
-                'status': 'pending',
-                'selected': False,
-                'feedback': '',
-                'error': None,
-                'candidate_name': candidate_name,
-                'candidate_phone': 'N/A',
-                'match_percentage': 0,
-                'ocr_used': False,
-                'cv_link': cv_link
-            }
-            
-            try:
-                if not is_valid_url(cv_link):
-                    result['error'] = f"Invalid URL: {cv_link}"
-                    result['status'] = 'error'
-                    results.append(result)
-                    st.warning(f"⚠️ {candidate_name}: Invalid URL")
-                    error_count += 1
-                    continue
-                
-                cv_file = download_cv_from_url(cv_link, candidate_name, timeout=45)
-                
-                if cv_file is None:
-                    if 'drive.google.com' in cv_link:
-                        error_msg = "🔒 File Google Drive PRIVATE - Butuh akses"
-                        result['error'] = f"Google Drive file is PRIVATE. Please set to public: {cv_link}"
-                        st.error(f"❌ {candidate_name}: {error_msg}")
-                    else:
-                        result['error'] = f"{get_text('download_error')}: {cv_link}"
-                        st.warning(f"❌ {candidate_name}: {get_text('download_error')}")
-                    
-                    result['status'] = 'error'
-                    results.append(result)
-                    error_count += 1
-                    
-                    # IMPROVEMENT: Continue processing instead of stopping
-                    continue
-                
+        jobs = [
+            {'filename': f"{row['candidate_name']}.pdf", 'url': row['cv_link'], 'candidate_name': row['candidate_name']}
+            for _, row in df.iterrows()
+        ]
+        
+        def show_progress(done: int, total: int, result: dict):
+            candidate_name = result['candidate_name']
+            progress_bar.progress(done / total)
+            status_text.text(f"⏳ {get_text('downloading_cv')} {done}/{total}: {candidate_name}")
+            if result['status'] == 'error':
+                st.warning(f"❌ {candidate_name}: {result['error']}")
+            else:
                 st.info(f"✅ {candidate_name}: {get_text('cv_downloaded')}")
-                
-                # Process the downloaded CV
-                processed_result = process_single_candidate(cv_file, role)
-                processed_result['cv_link'] = cv_link
-                processed_result['candidate_name'] = candidate_name
-                results.append(processed_result)
-                processed_count += 1
-                
-                # PERBAIKAN: Save progress setiap 3 CV (bukan setiap CV) untuk reduce I/O overhead
-                if processed_count % 3 == 0 or processed_count == total_cvs:
-                    st.session_state.batch_results = results
-                    save_results_to_disk()
-                    logger.info(f"Progress saved: {processed_count}/{total_cvs} CVs processed")
-                
-                # PERBAIKAN: Rate limiting - delay 1 detik antar CV untuk avoid API rate limit & reduce load
-                if idx < total_cvs - 1:  # Tidak perlu delay di CV terakhir
-                    time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"Error processing {candidate_name}: {e}")
-                result['error'] = f"Processing error: {str(e)}"
-                result['status'] = 'error'
-                results.append(result)
-                error_count += 1
-                st.error(f"❌ Error: {candidate_name} - {str(e)}")
-                
-                # IMPROVEMENT: Continue processing next CV
-                continue
+        
+        # Download (dibatasi per host), ekstraksi, dan analisa berjalan tumpang tindih.
+        # Rate limit API ditangani token bucket AI, bukan jeda tetap antar CV.
+        results = run_candidate_pipeline(jobs, role, on_progress=show_progress)
+        error_count = sum(1 for r in results if r['status'] == 'error')
+        processed_count = len(results) - error_count
         
         # PERBAIKAN: Final save setelah semua CV selesai diproses
         st.session_state.batch_results = results
@@ -1355,10 +2968,11 @@ def process_excel_cv_links(excel_file, role: str, max_cvs: int = 50) -> List[Dic
 
 
 # --- 8. FUNGSI PEMROSESAN KANDIDAT ---
-def process_single_candidate(resume_file, role: str) -> dict:
-    """Process a single resume with enhanced error handling and OCR support."""
-    result = {
-        'filename': resume_file.name,
+def new_candidate_result(filename: str, role: str) -> dict:
+    """Empty result record for a candidate, with a stable result_id."""
+    return {
+        'result_id': uuid.uuid4().hex,
+        'filename': filename,
         'role': role,
         'status': 'pending',
         'selected': False,
@@ -1369,70 +2983,442 @@ def process_single_candidate(resume_file, role: str) -> dict:
         'match_percentage': 0,
         'ocr_used': False,
     }
-    
+
+
+def extract_resume_text(pdf_bytes: bytes, enable_ocr: bool = True,
+                        ocr_profile: str = DEFAULT_OCR_PROFILE) -> Tuple[str, bool, List[str], List[str]]:
+    """
+    Extract text from raw PDF bytes. Returns (text, ocr_used, page_sources, notices).
+    Runs in worker threads, so it never calls st.*: notices for the user are
+    returned and shown by the calling script thread.
+    """
+    pdf_file = BytesIO(pdf_bytes)
+    if enable_ocr:
+        return extract_text_with_ocr_pages(pdf_file, ocr_profile)
+    text, page_sources = extract_pdf_text_pages(pdf_file)
+    return text, False, page_sources, []
+
+
+# Cache teks hasil ekstraksi per isi PDF: OCR CV hasil scan adalah langkah lokal
+# termahal, jadi file yang sama (upload ulang / link yang sama) tidak diproses lagi.
+# Hanya diakses dari thread utama, bukan dari worker ekstraksi.
+TEXT_CACHE = DiskCache('extracted_text', max_bytes=100_000_000)
+
+
+def text_cache_key(pdf_bytes: bytes, enable_ocr: bool, ocr_profile: str = DEFAULT_OCR_PROFILE) -> str:
+    """Cache key of extracted text: PDF content hash plus extraction mode and OCR profile."""
+    return f"{hashlib.sha256(pdf_bytes).hexdigest()}:{f'ocr-{ocr_profile}' if enable_ocr else 'text'}"
+
+
+def load_cached_resume_text(cache_key: str) -> Optional[Tuple[str, bool, List[str]]]:
+    """Return (text, ocr_used, notices) for a previously extracted PDF, or None."""
+    cached = TEXT_CACHE.get(cache_key)
+    if cached is None:
+        return None
+    data, meta = cached
+    logger.info(f"Using cached text extraction ({len(data)} bytes, pages: {meta.get('page_sources')})")
+    return data.decode('utf-8'), bool(meta.get('ocr_used')), list(meta.get('notices', []))
+
+
+def store_resume_text(cache_key: str, text: str, ocr_used: bool, page_sources: List[str],
+                      notices: Optional[List[str]] = None):
+    """Remember an extraction result; results with failed OCR pages are not kept."""
+    if 'ocr_failed' in page_sources:
+        return
+    try:
+        TEXT_CACHE.put(cache_key, text.encode('utf-8'), {'ocr_used': ocr_used, 'page_sources': page_sources, 'notices': notices or []})
+    except OSError as e:
+        logger.warning(f"Could not cache extracted text: {e}")
+
+
+def apply_analysis_outcome(result: dict, selected: bool, feedback: str, details: Dict) -> dict:
+    """Copy an analyze_resume outcome into a candidate result."""
+    # Get match percentage to ensure correct status
+    final_match_percentage = details.get('match_percentage', 0)
+    
+    # CRITICAL FIX: Ensure status is ALWAYS consistent with match_percentage
+    # Override selected if there's any inconsistency
+    if final_match_percentage >= 70:
+        selected = True
+        final_status = 'selected'
+    else:
+        selected = False
+        final_status = 'rejected'
+    
+    result.update({
+        'selected': selected,
+        'feedback': feedback,
+        'status': final_status,
+        'candidate_name': details.get('candidate_name', 'N/A'),
+        'candidate_phone': details.get('candidate_phone', 'N/A'),
+        'match_percentage': final_match_percentage,
+    })
+    
+    if 'matching_skills' in details:
+        result['matching_skills'] = details['matching_skills']
+    if 'missing_skills' in details:
+        result['missing_skills'] = details['missing_skills']
+    if 'experience_level' in details:
+        result['experience_level'] = details['experience_level']
+    if details.get('triaged'):
+        result['triaged'] = True
+    if 'resume_condensation' in details:
+        result['resume_condensation'] = details['resume_condensation']
+    
+    if result['feedback'].startswith(get_text('error_processing')):
+        result['status'] = 'error'
+        result['error'] = result['feedback']
+    return result
+
+
+async def analyze_candidate_text_async(result: dict, text: str, role: str) -> dict:
+    """
+    Run the AI analysis for extracted resume text and fill in result.
+    Does not persist anything, so it is safe to run off the script thread.
+    """
     try:
-        if st.session_state.get('enable_ocr', True):
-            text, ocr_used = extract_text_with_ocr(resume_file)
-            result['ocr_used'] = ocr_used
-        else:
-            text = extract_text_from_pdf(resume_file)
-            result['ocr_used'] = False
-        
         if not text or len(text.strip()) < 50:
             result['error'] = get_text('error_pdf_text')
             result['status'] = 'error'
             return result
         
-        analyzer = create_resume_analyzer()
-        if not analyzer:
-            result['error'] = get_text('error_api_key')
-            result['status'] = 'error'
-            return result
-        
-        selected, feedback, details = analyze_resume(text, role, analyzer)
-        
-        # Get match percentage to ensure correct status
-        final_match_percentage = details.get('match_percentage', 0)
-        
-        # CRITICAL FIX: Ensure status is ALWAYS consistent with match_percentage
-        # Override selected if there's any inconsistency
-        if final_match_percentage >= 70:
-            selected = True
-            final_status = 'selected'
-        else:
-            selected = False
-            final_status = 'rejected'
-        
-        result.update({
-            'selected': selected,
-            'feedback': feedback,
-            'status': final_status,
-            'candidate_name': details.get('candidate_name', 'N/A'),
-            'candidate_phone': details.get('candidate_phone', 'N/A'),
-            'match_percentage': final_match_percentage,
-        })
-        
-        if 'matching_skills' in details:
-            result['matching_skills'] = details['matching_skills']
-        if 'missing_skills' in details:
-            result['missing_skills'] = details['missing_skills']
-        if 'experience_level' in details:
-            result['experience_level'] = details['experience_level']
+        with leased_resume_analyzer() as analyzer:
+            if not analyzer:
+                result['error'] = get_text('error_api_key')
+                result['status'] = 'error'
+                return result
+            
+            selected, feedback, details = await analyze_resume_async(
+                text, role, analyzer,
+                force_reanalyze=st.session_state.get('force_reanalyze', False)
+            )
         
-        if result['feedback'].startswith(get_text('error_processing')):
-            result['status'] = 'error'
-            result['error'] = result['feedback']
-        else:
-            save_to_memory(result)
+        apply_analysis_outcome(result, selected, feedback, details)
             
     except Exception as e:
-        logger.error(f"Fatal error processing {resume_file.name}: {e}")
+        logger.error(f"Fatal error processing {result.get('filename')}: {e}")
         result['error'] = f"Fatal Error: {str(e)}"
         result['status'] = 'error'
-        
+    
+    return result
+
+
+async def analyze_candidate_batch_async(items: List[Tuple[dict, str]], role: str) -> List[dict]:
+    """
+    Batched variant of analyze_candidate_text_async for short resumes of one role:
+    one AI request covers the whole group. Returns the filled-in results.
+    """
+    runnable = []
+    for result, text in items:
+        if not text or len(text.strip()) < 50:
+            result['error'] = get_text('error_pdf_text')
+            result['status'] = 'error'
+        else:
+            runnable.append((result, text))
+    
+    try:
+        if runnable:
+            with leased_resume_analyzer() as analyzer:
+                if not analyzer:
+                    for result, _ in runnable:
+                        result['error'] = get_text('error_api_key')
+                        result['status'] = 'error'
+                else:
+                    force_reanalyze = st.session_state.get('force_reanalyze', False)
+                    analysis_requests = [prepare_resume_analysis(text, role, force_reanalyze) for _, text in runnable]
+                    outcomes = await analyze_resume_batch_async(analysis_requests, analyzer)
+                    
+                    # Satu hasil yang rusak tidak boleh menggagalkan seluruh grup:
+                    # hanya item itu yang dianalisa ulang lewat jalur satu-resume.
+                    failed = []
+                    for (result, text), outcome in zip(runnable, outcomes):
+                        try:
+                            apply_analysis_outcome(result, *outcome)
+                        except Exception as e:
+                            logger.warning(f"Unusable batched result for {result.get('filename')}: {e}")
+                            failed.append((result, text))
+                    
+                    for result, text in failed:
+                        try:
+                            apply_analysis_outcome(result, *await analyze_resume_async(text, role, analyzer, force_reanalyze=True))
+                        except Exception as e:
+                            logger.error(f"Fatal error processing {result.get('filename')}: {e}")
+                            result['error'] = f"Fatal Error: {str(e)}"
+                            result['status'] = 'error'
+    except Exception as e:
+        logger.error(f"Fatal error in batched analysis: {e}")
+        for result, _ in runnable:
+            if result['status'] == 'pending':
+                result['error'] = f"Fatal Error: {str(e)}"
+                result['status'] = 'error'
+    
+    return [result for result, _ in items]
+
+
+def finalize_candidate_result(result: dict) -> dict:
+    """Store a successful analysis in chatbot memory (persistence step, main thread only)."""
+    if result.get('status') in ('selected', 'rejected'):
+        try:
+            save_to_memory(result)
+        except Exception as e:
+            logger.error(f"Error saving {result.get('filename')} to memory: {e}")
     return result
 
 
+# --- 8.5 PIPELINE BATCH PARALEL ---
+# Tahap: download CV (thread pool, dibatasi per host) -> ekstraksi PDF/OCR
+# (thread pool) -> analisa AI (event loop async, jumlah in-flight terbatas + token bucket)
+# -> persistensi (hanya thread utama). Hasil tetap berurutan sesuai input.
+DOWNLOAD_MAX_WORKERS = 8
+# Batas download paralel per host: Google Drive paling ketat terhadap burst
+HOST_DOWNLOAD_LIMITS = {
+    'google_drive': 2,
+    'dropbox': 3,
+    'direct': 4,  # per hostname
+}
+
+_HOST_SEMAPHORES: Dict[str, threading.BoundedSemaphore] = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Concurrency slot for the host class of a download URL."""
+    host = (urlparse(url).hostname or '').lower()
+    if host.endswith('drive.google.com') or host.endswith('docs.google.com'):
+        key, limit = 'google_drive', HOST_DOWNLOAD_LIMITS['google_drive']
+    elif 'dropbox' in host:
+        key, limit = 'dropbox', HOST_DOWNLOAD_LIMITS['dropbox']
+    else:
+        key, limit = f"direct:{host}", HOST_DOWNLOAD_LIMITS['direct']
+    with _HOST_SEMAPHORES_LOCK:
+        if key not in _HOST_SEMAPHORES:
+            _HOST_SEMAPHORES[key] = threading.BoundedSemaphore(limit)
+        return _HOST_SEMAPHORES[key]
+
+
+def download_cv_bytes(url: str, candidate_name: str) -> Optional[bytes]:
+    """Download a CV while holding the per-host concurrency slot."""
+    with _host_semaphore(url):
+        cv_file = download_cv_from_url(url, candidate_name, timeout=45)
+    return cv_file.getvalue() if cv_file is not None else None
+
+
+def _download_error_message(url: str) -> str:
+    if 'drive.google.com' in url:
+        return f"Google Drive file is PRIVATE. Please set to public: {url}"
+    return f"{get_text('download_error')}: {url}"
+
+
+def _create_extraction_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool for extraction. Not a process pool: forking the multithreaded
+    Streamlit server can deadlock on locks held by other threads, and spawned
+    workers cannot import functions defined in the Streamlit script. The heavy
+    work runs in pdftoppm/tesseract subprocesses or native code anyway.
+    """
+    return ThreadPoolExecutor(max_workers=EXTRACTION_MAX_WORKERS, thread_name_prefix='extract')
+
+
+class AsyncLLMRunner:
+    """
+    Event loop in a background thread for the AI stage of the pipeline.
+    submit() schedules a coroutine and returns a concurrent Future, so the
+    pipeline waits on it together with download and extraction futures.
+    At most max_in_flight candidates are analyzed at once (each holds one
+    pooled analyzer); _LLM_IN_FLIGHT still caps Gemini calls process-wide.
+    """
+    
+    def __init__(self, max_in_flight: int = LLM_MAX_CONCURRENCY):
+        self._loop = asyncio.new_event_loop()
+        # asyncio.to_thread memakai executor default loop untuk panggilan Gemini yang blocking
+        self._loop.set_default_executor(ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='llm'))
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._thread = threading.Thread(target=self._run, name='llm-loop', daemon=True)
+        # Coroutine membaca session state (bahasa, API key, pengaturan), jadi loop memakai sesi script ini
+        ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(self._thread, ctx)
+        self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+    
+    async def _guarded(self, coroutine_function: Callable, args: tuple):
+        async with self._slots:
+            return await coroutine_function(*args)
+    
+    def submit(self, coroutine_function: Callable, *args) -> Future:
+        return asyncio.run_coroutine_threadsafe(self._guarded(coroutine_function, args), self._loop)
+    
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        """Stop the loop once its tasks finish (or are cancelled); Gemini calls already running complete."""
+        async def drain():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if cancel_futures:
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._loop.shutdown_default_executor()
+            self._loop.stop()
+        
+        asyncio.run_coroutine_threadsafe(drain(), self._loop)
+        if wait:
+            self._thread.join()
+
+
+def run_candidate_pipeline(
+    jobs: List[Dict],
+    role: str,
+    on_progress: Optional[Callable[[int, int, dict], None]] = None
+) -> List[dict]:
+    """
+    Process candidate jobs concurrently and return results in input order.
+    Each job has a 'filename' plus either 'pdf_bytes' or a 'url' to download;
+    an optional 'candidate_name' (e.g. from Excel) overrides the AI-extracted name.
+    The calling thread is the single writer: it stores memory entries and flushes
+    batch_results as each candidate completes, and reports progress via on_progress.
+    """
+    results = []
+    for job in jobs:
+        result = new_candidate_result(job['filename'], role)
+        if job.get('url'):
+            result['cv_link'] = job['url']
+        if job.get('candidate_name'):
+            result['candidate_name'] = job['candidate_name']
+        results.append(result)
+    if not jobs:
+        return results
+    
+    enable_ocr = st.session_state.get('enable_ocr', True)
+    ocr_profile = st.session_state.get('ocr_profile', DEFAULT_OCR_PROFILE)
+    batch_prompting = st.session_state.get('batch_prompting', False)
+    text_cache_keys = {}
+    batch_buffer: List[Tuple[int, str]] = []
+    completed = 0
+    
+    def complete(idx: int):
+        nonlocal completed
+        completed += 1
+        if jobs[idx].get('candidate_name'):
+            results[idx]['candidate_name'] = jobs[idx]['candidate_name']
+        finalize_candidate_result(results[idx])
+        st.session_state.batch_results = [r for r in results if r['status'] != 'pending']
+        save_results_to_disk()
+        if on_progress:
+            on_progress(completed, len(jobs), results[idx])
+    
+    def show_notices(idx: int, notices: List[str]):
+        # Peringatan dari worker ekstraksi ditampilkan dari thread script
+        for notice in notices:
+            st.warning(f"{results[idx]['filename']}: {notice}")
+    
+    def fail(idx: int, message: str):
+        results[idx]['error'] = message
+        results[idx]['status'] = 'error'
+        complete(idx)
+    
+    download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_MAX_WORKERS, thread_name_prefix='download')
+    extract_pool = _create_extraction_executor()
+    llm_pool = AsyncLLMRunner()
+    # Stop/rerun Streamlit memunculkan exception di complete()/on_progress; pekerjaan
+    # yang masih antri dibatalkan agar rerun tidak menunggu semua CV selesai diproses.
+    try:
+        pending = {}
+        
+        def submit_analysis(idx: int, text: str, ocr_used: bool):
+            results[idx]['ocr_used'] = ocr_used
+            if batch_prompting and estimate_tokens(text) <= LLM_BATCH_MAX_RESUME_TOKENS:
+                batch_buffer.append((idx, text))
+                if len(batch_buffer) >= LLM_BATCH_MAX_RESUMES:
+                    flush_batch()
+                return
+            # Worker mendapat salinan agar thread utama bebas membaca results
+            pending[llm_pool.submit(analyze_candidate_text_async, dict(results[idx]), text, role)] = ('analyze', idx)
+        
+        def flush_batch():
+            items = [(dict(results[idx]), text) for idx, text in batch_buffer]
+            pending[llm_pool.submit(analyze_candidate_batch_async, items, role)] = ('analyze_batch', [idx for idx, _ in batch_buffer])
+            batch_buffer.clear()
+        
+        def submit_extraction(idx: int, pdf_bytes: bytes):
+            text_cache_keys[idx] = text_cache_key(pdf_bytes, enable_ocr, ocr_profile)
+            cached = load_cached_resume_text(text_cache_keys[idx])
+            if cached is not None:
+                text, ocr_used, notices = cached
+                show_notices(idx, notices)
+                submit_analysis(idx, text, ocr_used)
+            else:
+                pending[extract_pool.submit(extract_resume_text, pdf_bytes, enable_ocr, ocr_profile)] = ('extract', idx)
+        
+        for idx, job in enumerate(jobs):
+            if job.get('pdf_bytes') is not None:
+                submit_extraction(idx, job['pdf_bytes'])
+            elif not is_valid_url(str(job.get('url', ''))):
+                fail(idx, f"Invalid URL: {job.get('url')}")
+            else:
+                pending[download_pool.submit(download_cv_bytes, job['url'], str(job.get('candidate_name') or job['filename']))] = ('download', idx)
+        
+        while pending or batch_buffer:
+            # Batch yang belum penuh dikirim saat tidak ada CV lain yang masih diunduh/diekstrak
+            if batch_buffer and not any(stage in ('download', 'extract') for stage, _ in pending.values()):
+                flush_batch()
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, idx = pending.pop(future)
+                
+                if stage == 'analyze_batch':
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        logger.error(f"Batched analysis failed: {e}")
+                        batch_results = [dict(results[i], error=f"Fatal Error: {str(e)}", status='error') for i in idx]
+                    for i, batch_result in zip(idx, batch_results):
+                        results[i] = batch_result
+                        complete(i)
+                    continue
+                
+                result = results[idx]
+                
+                if stage == 'download':
+                    try:
+                        pdf_bytes = future.result()
+                    except Exception as e:
+                        logger.error(f"Download failed for {result['filename']}: {e}")
+                        pdf_bytes = None
+                    if pdf_bytes is None:
+                        fail(idx, _download_error_message(jobs[idx]['url']))
+                        continue
+                    submit_extraction(idx, pdf_bytes)
+                elif stage == 'extract':
+                    try:
+                        text, ocr_used, page_sources, notices = future.result()
+                    except Exception as e:
+                        logger.error(f"Extraction failed for {result['filename']}: {e}")
+                        fail(idx, f"Fatal Error: {str(e)}")
+                        continue
+                    store_resume_text(text_cache_keys[idx], text, ocr_used, page_sources, notices)
+                    show_notices(idx, notices)
+                    submit_analysis(idx, text, ocr_used)
+                else:
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        logger.error(f"Analysis failed for {result['filename']}: {e}")
+                        results[idx]['error'] = f"Fatal Error: {str(e)}"
+                        results[idx]['status'] = 'error'
+                    complete(idx)
+    finally:
+        for pool in (download_pool, extract_pool, llm_pool):
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    return results
+
+
 # --- 9. FUNGSI UTILITY ---
 def clear_batch_resumes():
     """Clear uploaded resumes and save to disk."""
@@ -1532,7 +3518,7 @@ def create_chatbot() -> Optional[Agent]:
     try:
         return Agent(
             model=Gemini(
-                id="gemini-2.0-flash-exp",  # Using Gemini 2.0 Flash (latest version)
+                id=GEMINI_MODEL_ID,
                 api_key=api_key
             ),
             markdown=True,
@@ -1584,7 +3570,7 @@ def display_chatbot_interface():
             with st.chat_message("assistant"):
                 with st.spinner("🤔"):
                     try:
-                        response = chatbot.run(prompt)
+                        response = run_gemini_agent(chatbot, prompt)
                         
                         # FIXED: Improved response handling for Gemini
                         bot_message = None
@@ -2386,6 +4372,10 @@ def main():
         st.session_state['uploader_key'] = str(uuid.uuid4())
     if 'enable_ocr' not in st.session_state:
         st.session_state['enable_ocr'] = True  # OCR aktif secara default
+    if 'ocr_profile' not in st.session_state:
+        st.session_state['ocr_profile'] = DEFAULT_OCR_PROFILE
+    if 'triage_margin' not in st.session_state:
+        st.session_state['triage_margin'] = TRIAGE_DEFAULT_MARGIN
     
     # Sidebar
     with st.sidebar:
@@ -2413,7 +4403,37 @@ def main():
                 help=get_text('api_key_help'),
                 key='google_api_key_input'
             )
+            previous_api_key = st.session_state.get('google_api_key')
+            if previous_api_key and previous_api_key != api_key:
+                retire_resume_analyzers(previous_api_key)
             st.session_state['google_api_key'] = api_key
+            st.checkbox(
+                get_text('batch_prompting'),
+                value=st.session_state.get('batch_prompting', False),
+                help=get_text('batch_prompting_help'),
+                key='batch_prompting'
+            )
+            st.checkbox(
+                get_text('triage_mode'),
+                value=st.session_state.get('triage_mode', False),
+                help=get_text('triage_mode_help'),
+                key='triage_mode'
+            )
+            st.slider(
+                get_text('triage_margin'),
+                min_value=TRIAGE_MARGIN_RANGE[0],
+                max_value=TRIAGE_MARGIN_RANGE[1],
+                step=5,
+                help=get_text('triage_margin_help'),
+                key='triage_margin',
+                disabled=not st.session_state.get('triage_mode', False)
+            )
+            st.checkbox(
+                get_text('force_reanalyze'),
+                value=st.session_state.get('force_reanalyze', False),
+                help=get_text('force_reanalyze_help'),
+                key='force_reanalyze'
+            )
         
         # OCR Settings
         with st.expander(get_text('ocr_settings'), expanded=False):
@@ -2423,6 +4443,14 @@ def main():
                 help=get_text('ocr_help'),
                 key='enable_ocr'
             )
+            st.selectbox(
+                get_text('ocr_profile'),
+                list(OCR_PROFILES),
+                format_func=lambda profile: get_text(f'ocr_profile_{profile}'),
+                help=get_text('ocr_profile_help'),
+                key='ocr_profile',
+                disabled=not st.session_state.get('enable_ocr', True)
+            )
         
         # Supabase Settings
         with st.expander(get_text('supabase_settings'), expanded=True):
@@ -2446,7 +4474,7 @@ def main():
             
             # Connection status
             st.markdown(f"**{get_text('supabase_status')}:**")
-            if get_supabase_client():
+            if is_supabase_connected():
                 st.success(get_text('supabase_connected'))
             else:
                 st.warning(get_text('supabase_not_configured'))
@@ -2458,7 +4486,7 @@ def main():
     missing_configs = []
     if not st.session_state.get('google_api_key'):
         missing_configs.append(get_text('api_key_label'))
-    if not get_supabase_client():
+    if not is_supabase_connected():
         missing_configs.append("Supabase")
     
     if missing_configs:
@@ -2518,21 +4546,19 @@ def main():
                 
                 with col1:
                     if st.button(get_text('process_all_button'), type="primary", use_container_width=True):
-                        results = []
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        for idx, resume_file in enumerate(uploaded_files):
-                            progress = idx / len(uploaded_files)
-                            progress_bar.progress(progress)
-                            status_text.text(f"{get_text('processing_status')} {idx+1}/{len(uploaded_files)}: {resume_file.name}")
-                            
-                            result = process_single_candidate(resume_file, role)
-                            results.append(result)
-                            
-                            # Save progress after each file
-                            st.session_state.batch_results = results
-                            save_results_to_disk()
+                        def show_progress(done: int, total: int, result: dict):
+                            progress_bar.progress(done / total)
+                            status_text.text(f"{get_text('processing_status')} {done}/{total}: {result['filename']}")
+                        
+                        # Ekstraksi, analisa AI, dan penyimpanan berjalan paralel per tahap
+                        jobs = [
+                            {'filename': resume_file.name, 'pdf_bytes': resume_file.getvalue()}
+                            for resume_file in uploaded_files
+                        ]
+                        results = run_candidate_pipeline(jobs, role, on_progress=show_progress)
                         
                         progress_bar.progress(1.0)
                         status_text.text(f"✅ {get_text('processing_complete')}")
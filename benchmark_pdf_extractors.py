@@ -0,0 +1,30 @@
+"""
+Compare the PDF text backends used by agen_hiring on sample CVs.
+
+Usage: python benchmark_pdf_extractors.py cv1.pdf cv2.pdf ... [--repeat N]
+"""
+import argparse
+from pathlib import Path
+
+from agen_hiring import benchmark_pdf_extractors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', type=Path)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    pdf_files = [path.read_bytes() for path in args.pdfs]
+    report = benchmark_pdf_extractors(pdf_files, repeat=args.repeat)
+    
+    print(f"{'backend':<12} {'pages':>6} {'chars':>9} {'seconds':>9} {'pages/s':>9}")
+    for name, stats in report.items():
+        if 'error' in stats:
+            print(f"{name:<12} error: {stats['error']}")
+            continue
+        print(f"{name:<12} {stats['pages']:>6} {stats['chars']:>9} {stats['seconds']:>9.3f} {stats['pages_per_second']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import unittest
+
+import agen_hiring
+
+
+def resume(*sections):
+    return '\n'.join(line for section in sections for line in section)
+
+
+CONTACT = ["Budi Santoso", "budi@example.com", "0812 3456 7890"]
+SKILLS = ["Skills", "Python, Docker, PostgreSQL"]
+HOBBIES = ["Hobbies"] + [f"Hobby number {i} with a fairly long description of the activity" for i in range(200)]
+
+
+class CondenseResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.profile = agen_hiring.get_role_profile("Python\nDocker\nPostgreSQL")
+
+    def test_short_resume_is_kept_apart_from_noise(self):
+        text = resume(CONTACT, ["Page 1 of 2", "~|= ;:"], SKILLS, ["Curriculum Vitae"])
+        condensed, stats = agen_hiring.condense_resume(text, self.profile)
+        self.assertEqual(condensed, resume(CONTACT, SKILLS))
+        self.assertFalse(stats['truncated'])
+
+    def test_repeated_long_lines_are_dropped(self):
+        footer = "PT Contoh Sejahtera - Confidential"
+        text = resume(CONTACT, [footer], SKILLS, [footer])
+        condensed, _ = agen_hiring.condense_resume(text, self.profile)
+        self.assertEqual(condensed.count(footer), 1)
+
+    def test_token_budget(self):
+        text = resume(CONTACT, HOBBIES, SKILLS)
+        condensed, stats = agen_hiring.condense_resume(text, self.profile, token_budget=200)
+        self.assertTrue(stats['truncated'])
+        self.assertLessEqual(stats['condensed_tokens'], 200)
+        self.assertEqual(stats['tokens_saved'], stats['original_tokens'] - stats['condensed_tokens'])
+        # Kontak dan bagian skill lebih relevan daripada hobi, dan urutan asli dipertahankan
+        self.assertTrue(condensed.startswith(resume(CONTACT)))
+        self.assertTrue(condensed.endswith(resume(SKILLS)))
+
+    def test_one_letter_skill_lines_are_kept(self):
+        profile = agen_hiring.get_role_profile("Requirements:\n- C, R, Python")
+        text = resume(CONTACT, ["Skills", "C", "R", "x", "|", "Python"])
+        condensed, _ = agen_hiring.condense_resume(text, profile)
+        self.assertEqual(condensed.splitlines()[-4:], ["Skills", "C", "R", "Python"])
+
+    def test_job_title_is_not_a_section_heading(self):
+        self.assertIsNone(agen_hiring._section_kind("Project Manager"))
+        self.assertEqual(agen_hiring._section_kind("Project Manager:"), 'projects')
+        self.assertEqual(agen_hiring._section_kind("Work Experience"), 'experience')
+        self.assertEqual(agen_hiring._section_kind("Riwayat Pendidikan"), 'education')
+
+
+if __name__ == '__main__':
+    unittest.main()
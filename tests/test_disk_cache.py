@@ -0,0 +1,109 @@
+import itertools
+import os
+import stat
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import agen_hiring
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch.object(agen_hiring, 'CACHE_DIR', Path(tmp.name)):
+            self.cache = agen_hiring.DiskCache('test', max_bytes=10)
+        self.addCleanup(agen_hiring.DiskCache.instances.remove, self.cache)
+        # Jam palsu agar urutan last_used pasti
+        clock = itertools.count(1)
+        patcher = mock.patch.object(agen_hiring, 'time', types.SimpleNamespace(time=lambda: next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_put_and_get(self):
+        sha256 = self.cache.put('a', b'1234', {'filename': 'a.pdf'})
+        self.assertEqual(self.cache.get('a'), (b'1234', {'filename': 'a.pdf'}))
+        self.assertTrue(self.cache._blob_path(sha256).exists())
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', b'aaaa')
+        self.cache.put('b', b'bbbb')
+        self.cache.get('a')
+        self.cache.put('c', b'cccc')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a')[0], b'aaaa')
+        self.assertEqual(self.cache.get('c')[0], b'cccc')
+
+    def test_identical_content_is_stored_once(self):
+        self.cache.put('a', b'same')
+        self.cache.put('b', b'same')
+        self.cache.put('c', b'cc')
+        self.assertEqual(self.cache.get('a')[0], b'same')
+        self.assertEqual(self.cache.get('b')[0], b'same')
+        self.assertEqual(len(list((self.cache.root / 'blobs').iterdir())), 2)
+
+    def test_corrupt_blob_is_dropped(self):
+        sha256 = self.cache.put('a', b'1234')
+        self.cache._blob_path(sha256).write_bytes(b'xxxx')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_index_survives_a_new_instance(self):
+        self.cache.put('a', b'1234')
+        with mock.patch.object(agen_hiring, 'CACHE_DIR', self.cache.root.parent):
+            reopened = agen_hiring.DiskCache('test', max_bytes=10)
+        self.addCleanup(agen_hiring.DiskCache.instances.remove, reopened)
+        self.assertEqual(reopened.get('a')[0], b'1234')
+
+    def test_clear(self):
+        self.cache.put('a', b'1234')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertFalse((self.cache.root / 'blobs').exists())
+
+
+@unittest.skipUnless(hasattr(os, 'getuid'), "per-user cache directory is POSIX only")
+class PrivateCacheDirTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.expected = self.tmp / f"recruitment_cache-{os.getuid()}"
+        patcher = mock.patch.object(agen_hiring.tempfile, 'gettempdir', return_value=str(self.tmp))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop('RECRUITMENT_CACHE_DIR', None)
+
+    def mode(self, path):
+        return stat.S_IMODE(os.lstat(path).st_mode)
+
+    def test_creates_private_directory(self):
+        path = agen_hiring._private_cache_dir()
+        self.assertEqual(path, self.expected)
+        self.assertEqual(self.mode(path), 0o700)
+
+    def test_tightens_existing_directory(self):
+        self.expected.mkdir(mode=0o755)
+        os.chmod(self.expected, 0o755)
+        self.assertEqual(agen_hiring._private_cache_dir(), self.expected)
+        self.assertEqual(self.mode(self.expected), 0o700)
+
+    def test_symlink_falls_back_to_private_temp_dir(self):
+        target = self.tmp / 'elsewhere'
+        target.mkdir()
+        self.expected.symlink_to(target)
+        path = agen_hiring._private_cache_dir()
+        self.addCleanup(os.rmdir, path)
+        self.assertNotEqual(path, self.expected)
+        self.assertTrue(path.name.startswith('recruitment_cache-'))
+        self.assertEqual(self.mode(path), 0o700)
+
+
+if __name__ == '__main__':
+    unittest.main()
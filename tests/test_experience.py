@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime
+
+import agen_hiring
+
+
+def months(text):
+    return agen_hiring.merge_month_spans(agen_hiring.scan_date_spans(text.lower()))
+
+
+class MergeMonthSpansTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(agen_hiring.merge_month_spans([]), 0)
+
+    def test_overlapping_spans_count_once(self):
+        self.assertEqual(agen_hiring.merge_month_spans([(0, 10), (5, 15)]), 15)
+        self.assertEqual(agen_hiring.merge_month_spans([(0, 10), (2, 4)]), 10)
+
+    def test_touching_spans(self):
+        self.assertEqual(agen_hiring.merge_month_spans([(5, 10), (0, 5)]), 10)
+
+    def test_disjoint_spans(self):
+        self.assertEqual(agen_hiring.merge_month_spans([(0, 3), (10, 12)]), 5)
+
+
+class ScanDateSpansTest(unittest.TestCase):
+    def test_named_end_month_is_inclusive(self):
+        self.assertEqual(months("Jan 2020 - Dec 2021"), 24)
+
+    def test_bare_years(self):
+        self.assertEqual(months("2018 - 2020"), 24)
+
+    def test_overlapping_jobs(self):
+        self.assertEqual(months("Jan 2020 - Dec 2021\nJun 2021 - Jun 2022"), 30)
+
+    def test_touching_jobs(self):
+        self.assertEqual(months("Jan 2018 - Dec 2018\nJan 2019 - Dec 2019"), 24)
+
+    def test_present(self):
+        now = datetime.now()
+        expected = now.year * 12 + now.month - 2020 * 12
+        self.assertEqual(months("Jan 2020 - Present"), expected)
+        self.assertEqual(months("Januari 2020 s/d Sekarang"), expected)
+
+    def test_present_inside_earlier_job(self):
+        now = datetime.now()
+        self.assertEqual(months("Jan 2019 - Present\nMar 2020 - Jun 2021"), now.year * 12 + now.month - 2019 * 12)
+
+    def test_implausible_ranges_are_dropped(self):
+        self.assertEqual(months("1950 - 1960"), 0)
+        self.assertEqual(months("2021 - 2019"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import random
+import unittest
+
+import agen_hiring
+
+
+class SubstringMatcherTest(unittest.TestCase):
+    def test_overlapping_patterns(self):
+        matcher = agen_hiring.SubstringMatcher(["he", "she", "his", "hers"])
+        self.assertEqual(matcher.find("ushers"), {"he", "she", "hers"})
+
+    def test_pattern_inside_another_pattern(self):
+        matcher = agen_hiring.SubstringMatcher(["java", "javascript", "script", "sql", "mysql"])
+        self.assertEqual(matcher.find("javascript and mysql"), {"java", "javascript", "script", "sql", "mysql"})
+        self.assertEqual(matcher.find("postgresql"), {"sql"})
+
+    def test_empty_and_duplicate_patterns(self):
+        matcher = agen_hiring.SubstringMatcher(["", "python", "python"])
+        self.assertEqual(matcher.patterns, ("python",))
+        self.assertEqual(matcher.find(""), set())
+
+    def test_agrees_with_in(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            patterns = [''.join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(6)]
+            text = ''.join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+            expected = {pattern for pattern in patterns if pattern in text}
+            self.assertEqual(agen_hiring.SubstringMatcher(patterns).find(text), expected, (patterns, text))
+
+
+class SkillMatchTest(unittest.TestCase):
+    def test_phrase_and_word_matching(self):
+        percentage, matching, missing = agen_hiring.calculate_skills_match_percentage(
+            "experienced with python and docker containers", ["Python", "Docker", "Kubernetes"]
+        )
+        self.assertEqual(matching, ["Python", "Docker"])
+        self.assertEqual(missing, ["Kubernetes"])
+        self.assertEqual(percentage, 66)
+
+
+if __name__ == '__main__':
+    unittest.main()
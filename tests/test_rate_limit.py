@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+import agen_hiring
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        # Hanya modul aplikasi yang memakai jam palsu; thread lain tetap memakai time asli
+        patcher = mock.patch.object(agen_hiring, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_up_to_capacity_without_waiting(self):
+        bucket = agen_hiring.TokenBucket(rate=2, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_waits_for_refill_after_burst(self):
+        bucket = agen_hiring.TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [0.5])
+        self.assertEqual(self.clock.now, 100.5)
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = agen_hiring.TokenBucket(rate=4, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.now += 60
+        for _ in range(2):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [0.25])
+
+
+if __name__ == '__main__':
+    unittest.main()
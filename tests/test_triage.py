@@ -0,0 +1,28 @@
+import unittest
+
+import agen_hiring
+
+
+class GuessCandidateNameTest(unittest.TestCase):
+    def test_labelled_name(self):
+        self.assertEqual(agen_hiring.guess_candidate_name("Software Engineer\nNama: Budi Santoso"), "Budi Santoso")
+
+    def test_job_title_line_is_not_a_name(self):
+        self.assertEqual(agen_hiring.guess_candidate_name("Software Engineer\nJohn Doe"), "John Doe")
+
+    def test_requirements_words_are_not_a_name(self):
+        resume = "Data Warehouse Specialist\nAndi Wijaya"
+        self.assertEqual(agen_hiring.guess_candidate_name(resume, "Data warehouse, SQL"), "Andi Wijaya")
+
+    def test_section_heading_is_not_a_name(self):
+        self.assertEqual(agen_hiring.guess_candidate_name("Work Experience\nSiti Aminah"), "Siti Aminah")
+
+    def test_only_titles_gives_na(self):
+        self.assertEqual(agen_hiring.guess_candidate_name("Senior Project Manager\nSkills: Python"), "N/A")
+
+    def test_uppercase_name_is_title_cased(self):
+        self.assertEqual(agen_hiring.guess_candidate_name("JOHN DOE\nSoftware Engineer"), "John Doe")
+
+
+if __name__ == '__main__':
+    unittest.main()